@@ -0,0 +1,81 @@
+"""ABM common functions.
+
+The public API is listed in `__all__`. Submodules are imported on first attribute
+access through the module level `__getattr__`, so `import abm_common_functions`
+does not pay for `logging`, `rich` or any other dependency it does not use.
+"""
+
+from __future__ import annotations
+
+import importlib
+
+# Not imported from typing, which would cost more than the rest of this module.
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any
+
+    from abm_common_functions.base_class import BaseClass
+    from abm_common_functions.circuit_breaker import CircuitBreaker, CircuitOpenError
+    from abm_common_functions.cli_text_format import Dashboard
+    from abm_common_functions.dict_io import DictIO, DictSnapshot, diff_snapshots
+    from abm_common_functions.emo_logger import EmoFilter, EmoLogger, wait_for_maintenance
+    from abm_common_functions.metrics import (
+        METRICS,
+        MetricsFileDumper,
+        MetricsServer,
+        failure_report,
+        render_openmetrics,
+        utilization_report,
+    )
+
+_LAZY_ATTRIBUTES = {
+    "BaseClass": "abm_common_functions.base_class",
+    "CircuitBreaker": "abm_common_functions.circuit_breaker",
+    "CircuitOpenError": "abm_common_functions.circuit_breaker",
+    "Dashboard": "abm_common_functions.cli_text_format",
+    "DictIO": "abm_common_functions.dict_io",
+    "DictSnapshot": "abm_common_functions.dict_io",
+    "diff_snapshots": "abm_common_functions.dict_io",
+    "EmoFilter": "abm_common_functions.emo_logger",
+    "EmoLogger": "abm_common_functions.emo_logger",
+    "wait_for_maintenance": "abm_common_functions.emo_logger",
+    "METRICS": "abm_common_functions.metrics",
+    "MetricsFileDumper": "abm_common_functions.metrics",
+    "MetricsServer": "abm_common_functions.metrics",
+    "failure_report": "abm_common_functions.metrics",
+    "render_openmetrics": "abm_common_functions.metrics",
+    "utilization_report": "abm_common_functions.metrics",
+}
+
+__all__ = [
+    "METRICS",
+    "BaseClass",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "Dashboard",
+    "DictIO",
+    "DictSnapshot",
+    "EmoFilter",
+    "EmoLogger",
+    "MetricsFileDumper",
+    "MetricsServer",
+    "diff_snapshots",
+    "failure_report",
+    "render_openmetrics",
+    "utilization_report",
+    "wait_for_maintenance",
+]
+
+
+def __getattr__(name: str) -> Any:
+    """Import the submodule that defines `name` on first access."""
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
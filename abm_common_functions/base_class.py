@@ -1,18 +1,28 @@
 """Base class to monitor all child non-private method calls."""
 
-import time
+import traceback
+from contextvars import Token
 from logging import INFO
+from time import perf_counter
 from typing import Any, Callable
 
-from abm_common_functions.emo_logger import EmoLogger
+from abm_common_functions.call_context import CURRENT_CALL, CallContext, new_call_context
+from abm_common_functions.circuit_breaker import CircuitBreaker, CircuitOpenError
+from abm_common_functions.emo_logger import COMPRESSION_SUFFIXES, EmoLogger
+from abm_common_functions.metrics import METRICS
 
 DEFAULT_LOGGING_FOLDER = ".logs"
 DEFAULT_APP_NAME = "undefined"
+# Same value as inspect.CO_COROUTINE, kept here so importing the package does not import inspect.
+CO_COROUTINE = 0x80
+FAILURE_TRACEBACK_INTERVAL = 60.0
 
 
 class BaseClass:
     """Base class to monitor all child method calls."""
 
+    circuit_breaker: CircuitBreaker | None = None
+
     def __init__(self, log_folder: str | None = None, app_name: str | None = None):
         """Initialize the class with a logger."""
         if log_folder is None:
@@ -26,8 +36,9 @@ class BaseClass:
             self.app_name = app_name
 
         if not hasattr(self, "logger"):
-            self.logger = EmoLogger(self.log_folder, self.app_name, log_level=INFO)
-        self.logger.set_stack_distance(3)
+            self.logger = EmoLogger(
+                self.log_folder, self.app_name, log_level=INFO, **BaseClass.get_global_log_options()
+            )
 
     @staticmethod
     def set_global_log_data(log_folder: str, app_name: str):
@@ -35,6 +46,35 @@ class BaseClass:
         BaseClass.log_folder = log_folder
         BaseClass.app_name = app_name
 
+    @staticmethod
+    def set_global_log_options(
+        max_bytes: int | None = None,
+        compression: str | None = None,
+        retention_days: int | None = None,
+        retention_bytes: int | None = None,
+    ):
+        """Set the rotation, compression and retention of the loggers created by the class.
+
+        They apply to the loggers of the objects created afterwards, see EmoLogger for their meaning.
+        """
+        if (compression is not None) and (compression not in COMPRESSION_SUFFIXES):
+            raise ValueError(f"Unsupported compression '{compression}', use one of {sorted(COMPRESSION_SUFFIXES)}")
+        BaseClass.log_options = {
+            "max_bytes": max_bytes,
+            "compression": compression,
+            "retention_days": retention_days,
+            "retention_bytes": retention_bytes,
+        }
+
+    @staticmethod
+    def get_global_log_options() -> dict[str, Any]:
+        """Get the global rotation, compression and retention options of the loggers."""
+        try:
+            return BaseClass.log_options
+        except AttributeError:
+            BaseClass.log_options = {}
+            return BaseClass.log_options
+
     @staticmethod
     def get_global_log_folder() -> str:
         """Get the global log folder."""
@@ -62,21 +102,166 @@ class BaseClass:
 
     @staticmethod
     def _monitor_function(func: Callable[..., dict[str, Any]]) -> Callable[..., dict[str, Any]]:
-        """Private method to monitor function execution time."""
+        """Private method to monitor function execution time.
 
-        def wrapper(*args: ..., **kwargs: dict[str, Any]) -> Any:
-            start_time = time.time()
-            logger = args[0].logger if hasattr(args[0], "logger") else None
-            if logger:
-                logger.start(f"Starting '{func.__name__}'")
+        Every call is also recorded in the METRICS registry under the method's module and
+        qualified name, so same-named classes of different modules are kept apart.
+        Each call of an object with a logger runs in its own CallContext, so the records
+        logged from different threads and asyncio tasks are attributed separately.
+        Coroutine methods are timed until they finish, and add no busy time to the thread
+        running the event loop, since that time includes the time spent awaiting.
 
-            result: dict[str, Any] = func(*args, **kwargs)
+        A call that raises an Exception is recorded as a failure with its exception type and
+        duration, logged as an ERROR followed by the END matching its START, and its traceback
+        is logged at most once per FAILURE_TRACEBACK_INTERVAL seconds for each method.
+        A call interrupted by any other BaseException, such as KeyboardInterrupt, SystemExit
+        or asyncio.CancelledError, is only counted and logged as a cancellation, and leaves
+        the circuit breaker as it was.
+        If a circuit_breaker is set, calls are rejected with CircuitOpenError while it is open.
+        """
+        name = f"{func.__module__}.{func.__qualname__}"
+        stats = METRICS.method(name)
+        last_traceback_time = -FAILURE_TRACEBACK_INTERVAL
+        is_coroutine = bool(getattr(getattr(func, "__code__", None), "co_flags", 0) & CO_COROUTINE)
+        busy = not is_coroutine
 
-            end_time = time.time()
+        def enter(
+            logger: EmoLogger | None, breaker: CircuitBreaker | None, start_time: float
+        ) -> tuple[Token[CallContext | None] | None, int]:
+            if (breaker is not None) and (not breaker.allow(name)):
+                stats.short_circuit()
+                raise CircuitOpenError(f"Circuit open for '{name}', call rejected")
+
+            # The context only attributes log records, so calls without a logger skip it.
+            token = CURRENT_CALL.set(new_call_context(name)) if logger else None
+            running = stats.enter()
             if logger:
-                logger.end(f"Ending '{func.__name__}'")
-                logger.done(f"Execution time for '{func.__name__}': {end_time - start_time:.4f} seconds")
+                try:
+                    # stacklevel 3 skips enter() and the wrapper, so the record points at the caller.
+                    logger.start(f"Starting '{func.__name__}'", stacklevel=3)
+                except BaseException as exception:
+                    # End the call without logging, to release the breaker trial, the call in flight
+                    # and the context.
+                    leave(None, breaker, token, running, start_time, exception)
+                    raise
+            return token, running
+
+        def leave(
+            logger: EmoLogger | None,
+            breaker: CircuitBreaker | None,
+            token: Token[CallContext | None] | None,
+            running: int,
+            start_time: float,
+            exception: BaseException | None = None,
+        ) -> None:
+            nonlocal last_traceback_time
+            end_time = perf_counter()
+            duration = end_time - start_time
+
+            # The bookkeeping comes before the logs, and the context is reset even if logging raises.
+            try:
+                if exception is None:
+                    stats.leave(running, duration, busy=busy)
+                    if breaker is not None:
+                        breaker.record_success(name)
+                    if logger:
+                        logger.end(f"Ending '{func.__name__}'", stacklevel=3)
+                        logger.done(f"Execution time for '{func.__name__}': {duration:.4f} seconds", stacklevel=3)
+                    return
+
+                exception_type = type(exception).__name__
+                if not isinstance(exception, Exception):
+                    stats.leave(running, duration, busy=busy, cancelled=True)
+                    if breaker is not None:
+                        breaker.record_cancellation(name)
+                    if logger:
+                        logger.warning(
+                            f"Cancelled '{func.__name__}' after {duration:.4f} seconds: {exception_type}",
+                            stacklevel=3,
+                        )
+                        logger.end(f"Ending '{func.__name__}'", stacklevel=3)
+                    return
+
+                stats.leave(running, duration, error=True, exception_type=exception_type, busy=busy)
+                opened = breaker.record_failure(name, duration) if breaker is not None else False
+                if logger:
+                    logger.error(
+                        f"Failed '{func.__name__}' after {duration:.4f} seconds: {exception_type}: {exception}",
+                        stacklevel=3,
+                    )
+                    if end_time - last_traceback_time >= FAILURE_TRACEBACK_INTERVAL:
+                        last_traceback_time = end_time
+                        formatted = "".join(
+                            traceback.format_exception(type(exception), exception, exception.__traceback__)
+                        )
+                        logger.error(f"Traceback of '{func.__name__}':\n{formatted}", stacklevel=3)
+                    if opened:
+                        logger.warning(
+                            f"Circuit opened for '{func.__name__}' after repeated fast failures", stacklevel=3
+                        )
+                    logger.end(f"Ending '{func.__name__}'", stacklevel=3)
+            finally:
+                if token is not None:
+                    CURRENT_CALL.reset(token)
+
+        # Calls of objects without a logger or a breaker only need the stats, so the wrappers
+        # record them inline and skip enter() and leave().
+        def wrapper(*args: ..., **kwargs: dict[str, Any]) -> Any:
+            start_time = perf_counter()
+            obj = args[0] if args else None
+            logger = getattr(obj, "logger", None)
+            breaker = getattr(obj, "circuit_breaker", None)
+            if (not logger) and (breaker is None):
+                running = stats.enter()
+                try:
+                    result: dict[str, Any] = func(*args, **kwargs)
+                except Exception as exception:
+                    duration = perf_counter() - start_time
+                    stats.leave(running, duration, error=True, exception_type=type(exception).__name__)
+                    raise
+                except BaseException:
+                    stats.leave(running, perf_counter() - start_time, cancelled=True)
+                    raise
+                stats.leave(running, perf_counter() - start_time)
+                return result
+
+            token, running = enter(logger, breaker, start_time)
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as exception:
+                leave(logger, breaker, token, running, start_time, exception)
+                raise
+            leave(logger, breaker, token, running, start_time)
+            return result
+
+        async def async_wrapper(*args: ..., **kwargs: dict[str, Any]) -> Any:
+            start_time = perf_counter()
+            obj = args[0] if args else None
+            logger = getattr(obj, "logger", None)
+            breaker = getattr(obj, "circuit_breaker", None)
+            if (not logger) and (breaker is None):
+                running = stats.enter()
+                try:
+                    result: dict[str, Any] = await func(*args, **kwargs)  # type: ignore
+                except Exception as exception:
+                    duration = perf_counter() - start_time
+                    stats.leave(running, duration, error=True, exception_type=type(exception).__name__, busy=False)
+                    raise
+                except BaseException:
+                    stats.leave(running, perf_counter() - start_time, busy=False, cancelled=True)
+                    raise
+                stats.leave(running, perf_counter() - start_time, busy=False)
+                return result
 
+            token, running = enter(logger, breaker, start_time)
+            try:
+                result = await func(*args, **kwargs)  # type: ignore
+            except BaseException as exception:
+                leave(logger, breaker, token, running, start_time, exception)
+                raise
+            leave(logger, breaker, token, running, start_time)
             return result
 
+        if is_coroutine:
+            return async_wrapper
         return wrapper
@@ -0,0 +1,59 @@
+"""Context of the monitored call running in the current thread or asyncio task.
+
+The state lives in a `ContextVar`, so each thread and each asyncio task sees its
+own current call, and nested calls keep a link to their parent call.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from contextvars import ContextVar
+from itertools import count
+from typing import Any, NamedTuple
+
+_call_ids = count(1)
+
+
+class CallContext(NamedTuple):
+    """Identity of one monitored call."""
+
+    call_id: int
+    method: str
+    parent_call_id: int | None
+    thread_id: int
+    task_name: str | None
+
+
+CURRENT_CALL: ContextVar[CallContext | None] = ContextVar("abm_current_call", default=None)
+
+
+def current_task() -> Any:
+    """Get the running asyncio task, if any."""
+    # No task can be running if asyncio was never imported, so do not import it here.
+    asyncio = sys.modules.get("asyncio")
+    if asyncio is None:
+        return None
+    # _get_running_loop returns None outside of a loop, where current_task would raise.
+    loop = asyncio._get_running_loop()
+    if loop is None:
+        return None
+    return asyncio.current_task(loop)
+
+
+def current_task_name() -> str | None:
+    """Get the name of the running asyncio task, if any."""
+    task = current_task()
+    return None if task is None else task.get_name()
+
+
+def new_call_context(method: str) -> CallContext:
+    """Create the context of a new call of `method`, child of the current call."""
+    parent = CURRENT_CALL.get()
+    return CallContext(
+        call_id=next(_call_ids),
+        method=method,
+        parent_call_id=None if parent is None else parent.call_id,
+        thread_id=threading.get_ident(),
+        task_name=current_task_name(),
+    )
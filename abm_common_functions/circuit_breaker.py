@@ -0,0 +1,105 @@
+"""Circuit breaker hook for the BaseClass monitor.
+
+Set `circuit_breaker` on a BaseClass subclass, or on one instance, to stop calling
+a method that keeps failing fast. After `failure_threshold` consecutive failures
+that each took at most `fast_failure_seconds`, the circuit of that method opens
+and calls raise `CircuitOpenError` without running. After `reset_timeout` seconds
+one trial call is let through: a success closes the circuit, a failure opens it again.
+Only Exceptions are failures; a call interrupted by a cancellation, KeyboardInterrupt
+or SystemExit is recorded as a cancellation and leaves the circuit as it was.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a method whose circuit is open."""
+
+
+class _CircuitState:
+    __slots__ = ("consecutive_failures", "opened_at", "trial_in_flight")
+
+    def __init__(self) -> None:
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None
+        self.trial_in_flight = False
+
+
+class CircuitBreaker:
+    """Per method circuit breaker that opens after repeated fast failures."""
+
+    def __init__(self, failure_threshold: int = 5, fast_failure_seconds: float = 1.0, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.fast_failure_seconds = fast_failure_seconds
+        self.reset_timeout = reset_timeout
+        self._states: dict[str, _CircuitState] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, method: str) -> _CircuitState:
+        state = self._states.get(method)
+        if state is None:
+            state = self._states.setdefault(method, _CircuitState())
+        return state
+
+    def is_open(self, method: str) -> bool:
+        """Check if the circuit of the method is open."""
+        state = self._states.get(method)
+        return state is not None and state.opened_at is not None
+
+    def allow(self, method: str) -> bool:
+        """Check if a call of the method may run now."""
+        with self._lock:
+            state = self._state(method)
+            if state.opened_at is None:
+                return True
+            if state.trial_in_flight or (time.monotonic() - state.opened_at < self.reset_timeout):
+                return False
+            state.trial_in_flight = True
+            return True
+
+    def record_success(self, method: str) -> None:
+        """Record a successful call, which closes the circuit."""
+        with self._lock:
+            state = self._state(method)
+            state.consecutive_failures = 0
+            state.opened_at = None
+            state.trial_in_flight = False
+
+    def record_cancellation(self, method: str) -> None:
+        """Record a cancelled call, which neither closes nor opens the circuit.
+
+        A cancelled trial call only frees the trial, so the next call may try again.
+        """
+        with self._lock:
+            self._state(method).trial_in_flight = False
+
+    def record_failure(self, method: str, seconds: float) -> bool:
+        """Record a failed call that took `seconds`.
+
+        Returns True if this failure opened the circuit.
+        """
+        with self._lock:
+            state = self._state(method)
+            if state.trial_in_flight:
+                state.trial_in_flight = False
+                state.opened_at = time.monotonic()
+                return True
+            if seconds > self.fast_failure_seconds:
+                state.consecutive_failures = 0
+                return False
+            state.consecutive_failures += 1
+            if (state.opened_at is None) and (state.consecutive_failures >= self.failure_threshold):
+                state.opened_at = time.monotonic()
+                return True
+            return False
+
+    def reset(self, method: str | None = None) -> None:
+        """Close the circuit of one method, or of all methods."""
+        with self._lock:
+            if method is None:
+                self._states.clear()
+            else:
+                self._states.pop(method, None)
@@ -0,0 +1,216 @@
+"""Live terminal dashboard of the running process, rendered with rich.
+
+The dashboard only reads what the hot paths already record: the METRICS registry
+filled by the BaseClass monitor, the RECORD_COUNTS of EmoLogger and the live
+DictIO STORES. Rendering runs on the rich Live refresh thread, and a rendered
+frame is reused until `1 / refresh_per_second` has passed. While it is live, the
+EmoLogger stream output only appends lines to a bounded tail drawn as a panel,
+so logging threads never render anything.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import deque
+from typing import IO, TYPE_CHECKING, Any, Iterable
+
+from abm_common_functions.dict_io import live_stores
+from abm_common_functions.emo_logger import RECORD_COUNTS, redirect_stream_handlers
+from abm_common_functions.metrics import METRICS, MetricsRegistry, histogram_percentile
+
+if TYPE_CHECKING:
+    from rich.console import Console, Group
+    from rich.live import Live
+    from rich.panel import Panel
+    from rich.table import Table
+
+    from abm_common_functions.dict_io import DictIO
+
+# rich is imported by the methods that render, so importing this module stays cheap.
+
+DEFAULT_REFRESH_PER_SECOND = 2.0
+DEFAULT_LOG_LINES = 10
+
+
+def format_seconds(seconds: float | None) -> str:
+    """Format a duration for a table cell."""
+    if seconds is None:
+        return "-"
+    if seconds < 1.0:
+        return f"{seconds * 1000:.2f} ms"
+    return f"{seconds:.2f} s"
+
+
+def format_rate(rate: float | None) -> str:
+    """Format a per second rate for a table cell."""
+    if rate is None:
+        return "-"
+    return f"{rate:,.1f}/s"
+
+
+class LogTail:
+    """Write-only stream that keeps the last lines written to it."""
+
+    def __init__(self, max_lines: int = DEFAULT_LOG_LINES) -> None:
+        self.lines: deque[str] = deque(maxlen=max_lines)
+
+    def write(self, text: str) -> int:
+        # A deque append is atomic, so the handlers of different loggers need no shared lock.
+        self.lines.extend(line for line in text.splitlines() if line)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+class Dashboard:
+    """Live view of method calls, log records and DictIO stores.
+
+    Use it as a context manager, or call `start` and `stop`. While it is live, the
+    EmoLogger stream handlers write to `log_tail`, whose last `log_lines` lines are
+    shown in a panel, instead of between the frames of the display.
+    """
+
+    def __init__(
+        self,
+        registry: MetricsRegistry | None = None,
+        stores: Iterable[DictIO] | None = None,
+        refresh_per_second: float = DEFAULT_REFRESH_PER_SECOND,
+        console: Console | None = None,
+        log_lines: int = DEFAULT_LOG_LINES,
+    ) -> None:
+        self.registry = METRICS if registry is None else registry
+        self.stores = None if stores is None else list(stores)
+        self.refresh_per_second = refresh_per_second
+        self.console = console
+        self.log_tail = LogTail(log_lines)
+        self._previous_redirect: IO[str] | None = None
+        self._live: Live | None = None
+        self._frame: Group | None = None
+        self._frame_time: float | None = None
+        self._previous_calls: dict[str, int] = {}
+        self._previous_records: dict[tuple[str | None, int], int] = {}
+
+    @staticmethod
+    def _rate(current: int, previous: int | None, elapsed: float | None) -> float | None:
+        if (previous is None) or (elapsed is None) or (elapsed <= 0):
+            return None
+        return (current - previous) / elapsed
+
+    def _methods_table(self, elapsed: float | None) -> Table:
+        from rich.table import Table
+
+        table = Table(title="Methods", expand=True)
+        for column in ("Method", "Calls", "Rate", "Errors", "p50", "p95", "p99", "In flight"):
+            table.add_column(column, justify="left" if column == "Method" else "right")
+
+        calls = {}
+        for snapshot in self.registry.snapshot():
+            if snapshot.calls == 0:
+                continue
+            calls[snapshot.name] = snapshot.calls
+            rate = self._rate(snapshot.calls, self._previous_calls.get(snapshot.name), elapsed)
+            table.add_row(
+                snapshot.name,
+                f"{snapshot.calls:,}",
+                format_rate(rate),
+                f"{snapshot.errors:,}",
+                *(format_seconds(histogram_percentile(snapshot.bucket_counts, q)) for q in (0.5, 0.95, 0.99)),
+                str(snapshot.in_flight),
+            )
+        self._previous_calls = calls
+        return table
+
+    def _records_table(self, elapsed: float | None) -> Table:
+        from rich.table import Table
+
+        table = Table(title="Log records", expand=True)
+        for column in ("App", "Level", "Records", "Rate"):
+            table.add_column(column, justify="left" if column in ("App", "Level") else "right")
+
+        records = RECORD_COUNTS.copy()
+        for (app_name, level), count in sorted(records.items(), key=lambda item: (str(item[0][0]), item[0][1])):
+            rate = self._rate(count, self._previous_records.get((app_name, level)), elapsed)
+            table.add_row(str(app_name), logging.getLevelName(level), f"{count:,}", format_rate(rate))
+        self._previous_records = records
+        return table
+
+    def _stores_table(self) -> Table:
+        from rich.table import Table
+
+        table = Table(title="DictIO stores", expand=True)
+        for column in ("File", "Keys", "State", "Last save", "Save p50", "Save p95"):
+            table.add_column(column, justify="left" if column in ("File", "State") else "right")
+
+        stores = live_stores() if self.stores is None else self.stores
+        for store in sorted(stores, key=lambda store: store.filepath):
+            data = getattr(store, "data", None)
+            state = "saved ✅" if store.is_saved else "dirty ❌"
+            save_counts = store.save_stats.snapshot().bucket_counts
+            table.add_row(
+                store.filepath,
+                "-" if data is None else f"{len(data):,}",
+                state,
+                format_seconds(store.last_save_seconds),
+                *(format_seconds(histogram_percentile(save_counts, q)) for q in (0.5, 0.95)),
+            )
+        return table
+
+    def _log_panel(self) -> Panel:
+        from rich.panel import Panel
+        from rich.text import Text
+
+        return Panel(Text("\n".join(self.log_tail.lines), no_wrap=True, overflow="ellipsis"), title="Log")
+
+    def render(self) -> Group:
+        """Build the dashboard, reusing the last frame if it is younger than the refresh interval."""
+        now = time.monotonic()
+        if (
+            (self._frame is not None)
+            and (self._frame_time is not None)
+            and (now - self._frame_time < 1.0 / self.refresh_per_second)
+        ):
+            return self._frame
+
+        from rich.console import Group
+
+        elapsed = None if self._frame_time is None else now - self._frame_time
+        self._frame = Group(
+            self._methods_table(elapsed), self._records_table(elapsed), self._stores_table(), self._log_panel()
+        )
+        self._frame_time = now
+        return self._frame
+
+    def start(self) -> Dashboard:
+        """Start the live display on its own refresh thread."""
+        if self._live is None:
+            from rich.live import Live
+
+            # Output redirected through Live re-renders the display on the writing thread once
+            # per line, so the log records go to the tail instead.
+            self._live = Live(
+                get_renderable=self.render,
+                refresh_per_second=self.refresh_per_second,
+                console=self.console,
+                redirect_stdout=False,
+                redirect_stderr=False,
+            )
+            self._previous_redirect = redirect_stream_handlers(self.log_tail)
+            self._live.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the live display."""
+        if self._live is None:
+            return
+        self._live.stop()
+        self._live = None
+        redirect_stream_handlers(self._previous_redirect)
+        self._previous_redirect = None
+
+    def __enter__(self) -> Dashboard:
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
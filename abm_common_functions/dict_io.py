@@ -1,9 +1,121 @@
 import os
-import pickle
+import threading
 import time
+import weakref
+from collections.abc import Iterator, Mapping
+from itertools import count
 from typing import Any
 
 from abm_common_functions.base_class import BaseClass
+from abm_common_functions.metrics import MethodStats
+
+# Every live DictIO, read by the cli_text_format dashboard through `live_stores`.
+STORES: weakref.WeakSet["DictIO"] = weakref.WeakSet()
+# A WeakSet only guards removals during iteration, so adds and copies hold this lock.
+_stores_lock = threading.Lock()
+
+# Unique id of each DictIO, unlike id() never reused after a store is collected.
+_store_ids = count(1)
+
+# Bookkeeping keys kept in the data, which are not versioned and never reported by diffs.
+META_KEYS = frozenset(
+    ("_first_timestamp", "_last_read_timestamp", "_last_memory_update_timestamp", "_last_write_timestamp")
+)
+
+
+def live_stores() -> list["DictIO"]:
+    """Get the live DictIO stores, safe to call while other threads create stores."""
+    with _stores_lock:
+        return list(STORES)
+
+
+def _dump(data: dict[str, Any], filepath: str) -> None:
+    """Pickle the data to a temporary file and move it into place."""
+    import pickle
+
+    path = os.path.dirname(filepath)
+    if path and not os.path.exists(path):
+        os.makedirs(path, exist_ok=True)
+    # One temporary file per thread, so concurrent saves never write to the same file.
+    temp_filepath = f"{filepath}.{threading.get_ident()}.tmp"
+    with open(temp_filepath, "wb") as f:
+        pickle.dump(data, f)
+    os.replace(temp_filepath, filepath)
+
+
+class DictSnapshot(Mapping[str, Any]):
+    """Read-only point-in-time view of a DictIO.
+
+    A snapshot shares its dict with the store until the store's next write, which
+    copies the dict (not the values) before changing it. Values are shared, so they
+    must be replaced through the store rather than mutated in place.
+    """
+
+    __slots__ = ("filepath", "version", "_store", "_store_id", "_data", "_key_versions", "_deleted", "__weakref__")
+
+    def __init__(
+        self,
+        filepath: str,
+        version: int,
+        store: "DictIO",
+        data: dict[str, Any],
+        key_versions: dict[str, int],
+        deleted: dict[str, int],
+    ):
+        self.filepath = filepath
+        self.version = version
+        self._store = weakref.ref(store)
+        self._store_id = store._store_id
+        self._data = data
+        self._key_versions = key_versions
+        self._deleted = deleted
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def save(self, filepath: str | None = None) -> bool:
+        """Save the snapshot, by default to the file of its store.
+
+        Safe to run from a background thread while the store keeps changing. A save to
+        the file of the store goes through the store, and is skipped if the file already
+        holds a newer version, so an older snapshot never replaces newer data.
+        Returns whether the file was written.
+        """
+        if filepath is None:
+            filepath = self.filepath
+        store = self._store()
+        if (store is not None) and (os.path.abspath(filepath) == os.path.abspath(store.filepath)):
+            return store._write_snapshot(self)
+        _dump(self._data, filepath)
+        return True
+
+    def __repr__(self) -> str:
+        return f"DictSnapshot(file={self.filepath!r}, version={self.version}, keys={len(self._data)})"
+
+
+def diff_snapshots(snapshot_a: DictSnapshot, snapshot_b: DictSnapshot) -> set[str]:
+    """Get the keys that were added, changed or removed between two snapshots of the same store.
+
+    Only the version stamps of the keys are compared, never the values. A key set
+    again to an equal value is still reported.
+    """
+    if snapshot_a._store_id != snapshot_b._store_id:
+        raise ValueError("Cannot diff snapshots of different stores.")
+    if snapshot_a.version == snapshot_b.version:
+        return set()
+
+    older, newer = sorted((snapshot_a, snapshot_b), key=lambda snapshot: snapshot.version)
+    changed = {key for key, version in newer._key_versions.items() if version > older.version}
+    changed.update(
+        key for key, version in newer._deleted.items() if (version > older.version) and (key in older._key_versions)
+    )
+    return changed
 
 
 class DictIO(BaseClass):
@@ -11,6 +123,26 @@ class DictIO(BaseClass):
         """Initialize the class with a filepath and load the data if it exists."""
         super().__init__()
         self.filepath = filepath
+        self._store_id = next(_store_ids)
+        self.last_save_seconds: float | None = None
+        # Durations of the saves of this store that wrote the file, apart from the METRICS registry.
+        self.save_stats = MethodStats(f"{type(self).__name__}.save")
+        # Copy-on-write state: every write of a key stamps it with a new version, and
+        # a dict referenced by a snapshot is copied before the next write.
+        self._version = 0
+        self._key_versions: dict[str, int] = {}
+        # Tombstones of the deleted keys, kept only while a live snapshot may be diffed against them.
+        self._deleted: dict[str, int] = {}
+        self._snapshots: weakref.WeakValueDictionary[int, DictSnapshot] = weakref.WeakValueDictionary()
+        # A read while a snapshot shares the dict is stamped here, so the read does not copy the dict.
+        self._pending_read_timestamp: float | None = None
+        # Guards the copy-on-write state, so a snapshot never sees half of a write.
+        self._lock = threading.Lock()
+        # Serializes the writes to the file and remembers the version it holds.
+        self._save_lock = threading.Lock()
+        self._saved_version: int | None = None
+        with _stores_lock:
+            STORES.add(self)
         if load:
             if os.path.exists(filepath):
                 self.load()
@@ -18,60 +150,105 @@ class DictIO(BaseClass):
                 self.data: dict[str, Any] = {}
                 self._set_first_timestamp()
 
+    def _is_shared(self) -> bool:
+        """Check if a live snapshot still references the current dicts, the caller holds the lock.
+
+        A snapshot takes the data, key versions and tombstones together, and they are only
+        ever replaced together, so checking the data is enough.
+        """
+        return any(snapshot._data is self.data for snapshot in self._snapshots.values())
+
+    def _before_write(self) -> None:
+        """Copy the dicts shared with a live snapshot before changing them, the caller holds the lock."""
+        if self._snapshots and self._is_shared():
+            self.data = dict(self.data)
+            self._key_versions = dict(self._key_versions)
+            self._deleted = dict(self._deleted)
+        if self._pending_read_timestamp is not None:
+            self.data["_last_read_timestamp"] = self._pending_read_timestamp
+            self._pending_read_timestamp = None
+
+    def _stamp(self, key: str) -> None:
+        """Set a bookkeeping timestamp, the caller holds the lock."""
+        self._before_write()
+        self.data[key] = time.time()
+
     def _set_last_read_timestamp(self) -> None:
-        self.data["_last_read_timestamp"] = time.time()
+        with self._lock:
+            if self._snapshots and self._is_shared():
+                self._pending_read_timestamp = time.time()
+            else:
+                self._stamp("_last_read_timestamp")
 
     def _get_last_read_timestamp(self) -> float:
+        if self._pending_read_timestamp is not None:
+            return self._pending_read_timestamp
         return self.data.get("_last_read_timestamp", None)
 
     def _set_first_timestamp(self) -> None:
-        self.data["_first_timestamp"] = time.time()
+        with self._lock:
+            self._stamp("_first_timestamp")
 
     def _get_first_timestamp(self) -> float:
         return self.data.get("first_timestamp", None)
 
     def _set_last_memory_update_timestamp(self) -> None:
-        self.data["_last_memory_update_timestamp"] = time.time()
+        with self._lock:
+            self._stamp("_last_memory_update_timestamp")
 
     def _get_last_memory_update_timestamp(self) -> float:
         return self.data.get("_last_memory_update_timestamp", None)
 
     def _set_last_write_timestamp(self) -> None:
-        self.data["_last_write_timestamp"] = time.time()
+        with self._lock:
+            self._stamp("_last_write_timestamp")
 
     def _get_last_write_timestamp(self) -> float:
         return self.data.get("_last_write_timestamp", None)
 
     def _is_saved(self) -> bool:
-        """Check if the data is saved to the file."""
+        """Check if the data is saved to the file.
+
+        The file is up to date when it holds the current version, whichever save wrote it.
+        """
         if not os.path.exists(self.filepath):
             return False
 
         if getattr(self, "data", None) is None:
             return False
 
-        if self.data.get("_last_write_timestamp", None) is None:
-            return False
+        return self._saved_version == self._version
 
-        if self._get_last_memory_update_timestamp() > self._get_last_write_timestamp():
-            return False
+    @property
+    def is_saved(self) -> bool:
+        """Whether the in-memory data matches the file."""
+        return self._is_saved()
 
-        return True
+    def _write_snapshot(self, snapshot: DictSnapshot) -> bool:
+        """Write a snapshot to the file, unless the file already holds a newer version."""
+        with self._save_lock:
+            if (self._saved_version is not None) and (snapshot.version < self._saved_version):
+                return False
+            _dump(snapshot._data, self.filepath)
+            self._saved_version = snapshot.version
+            return True
 
     def save(self) -> None:
-        """Save the data to the file."""
+        """Save the data to the file.
+
+        The data is written to a temporary file that replaces the file, so a failed
+        save never leaves a truncated file behind.
+        """
         if self._is_saved():
             return
 
         try:
-            path = os.path.dirname(self.filepath)
-            if not os.path.exists(path):
-                os.makedirs(path)
-
             self._set_last_write_timestamp()
 
-            with open(self.filepath, "wb") as f:
-                pickle.dump(self.data, f)
+            start_time = time.perf_counter()
+            self._write_snapshot(self._snapshot())
+            self.last_save_seconds = time.perf_counter() - start_time
+            self.save_stats.record(self.last_save_seconds)
         except Exception as e:
             error_message = f"Error saving data to {self.filepath}: {e}"
             self.logger.error(error_message)
@@ -87,18 +264,93 @@ class DictIO(BaseClass):
             error_message = "Loading will overwrite the in-memory updates."
             self.logger.error(error_message)
 
+        import pickle
+
         with open(self.filepath, "rb") as f:
-            self.data = pickle.load(f)
+            data = pickle.load(f)
+
+        with self._lock:
+            self._version += 1
+            previous_keys = getattr(self, "data", {}).keys() - META_KEYS
+            self._deleted = {**self._deleted, **{key: self._version for key in previous_keys - data.keys()}}
+            self._key_versions = {key: self._version for key in data.keys() - META_KEYS}
+            self.data = data
+            self._pending_read_timestamp = None
+            self._saved_version = self._version
+            self._prune_deleted()
 
         self._set_last_read_timestamp()
 
+    def _prune_deleted(self) -> None:
+        """Drop the tombstones that no live snapshot can be diffed against, the caller holds the lock.
+
+        A diff only reads the tombstones newer than its older snapshot, so the ones up to
+        the version of the oldest live snapshot are never read again. The dict may be
+        shared with a snapshot, so it is replaced rather than changed.
+        """
+        if not self._deleted:
+            return
+        oldest = min((snapshot.version for snapshot in self._snapshots.values()), default=self._version)
+        if any(version <= oldest for version in self._deleted.values()):
+            self._deleted = {key: version for key, version in self._deleted.items() if version > oldest}
+
+    def _snapshot(self) -> DictSnapshot:
+        with self._lock:
+            self._prune_deleted()
+            snapshot = DictSnapshot(self.filepath, self._version, self, self.data, self._key_versions, self._deleted)
+            self._snapshots[id(snapshot)] = snapshot
+            return snapshot
+
+    def snapshot(self) -> DictSnapshot:
+        """Take a read-only point-in-time view of the data without copying it."""
+        return self._snapshot()
+
+    def diff(self, snapshot_a: DictSnapshot, snapshot_b: DictSnapshot | None = None) -> set[str]:
+        """Get the keys changed between two snapshots, or between a snapshot and the current data."""
+        if snapshot_b is None:
+            snapshot_b = self._snapshot()
+        return diff_snapshots(snapshot_a, snapshot_b)
+
+    def replicate(self, target: "DictIO", since: DictSnapshot | None = None) -> DictSnapshot:
+        """Copy the keys changed since the `since` snapshot to the target store and save it.
+
+        Without `since` every key is copied. Returns the snapshot to pass as `since` next time.
+        """
+        current = self._snapshot()
+        keys = (current.keys() - META_KEYS) if since is None else diff_snapshots(since, current)
+        for key in keys:
+            if key in current:
+                target[key] = current[key]
+            elif key in target.data:
+                del target[key]
+        target.save()
+        return current
+
     def __getitem__(self, key: str):
         self._set_last_read_timestamp()
         return self.data[key]
 
     def __setitem__(self, key: str, value: Any):
-        self._set_last_memory_update_timestamp()
-        self.data[key] = value
+        with self._lock:
+            self._stamp("_last_memory_update_timestamp")
+            self._version += 1
+            self._key_versions[key] = self._version
+            self._deleted.pop(key, None)
+            self.data[key] = value
+
+    def __delitem__(self, key: str):
+        with self._lock:
+            if key not in self.data:
+                raise KeyError(key)
+            self._stamp("_last_memory_update_timestamp")
+            self._version += 1
+            self._key_versions.pop(key, None)
+            if self._snapshots:
+                self._deleted[key] = self._version
+            elif self._deleted:
+                # Without a live snapshot no diff can read the tombstones.
+                self._deleted = {}
+            del self.data[key]
 
     def __repr__(self):
         return self.__str__()
@@ -2,6 +2,10 @@ from __future__ import annotations
 
 import logging
 import os
+import re
+import sys
+import threading
+from contextvars import ContextVar
 from logging import (
     CRITICAL,
     DEBUG,
@@ -13,9 +17,184 @@ from logging import (
     StreamHandler,
     getLogger,
 )
-from sys import stdout
-from time import strftime, time
-from typing import Mapping
+from time import localtime, mktime, strftime, strptime, time
+from typing import IO, TYPE_CHECKING, Callable, Iterator, Mapping
+from weakref import WeakKeyDictionary
+
+from abm_common_functions.call_context import CURRENT_CALL, current_task, current_task_name
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+# The compression codecs, shutil and concurrent.futures are imported where they are
+# first used, so importing the logger stays cheap for short-lived processes.
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "lzma": ".xz"}
+DAY_FOLDER_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+# Number of records logged per (app_name, level), read by the cli_text_format dashboard.
+RECORD_COUNTS: dict[tuple[str | None, int], int] = {}
+# Makes the increments atomic, the dashboard only copies the dict.
+_record_counts_lock = threading.Lock()
+
+# Stream that the StdoutHandlers write to instead of sys.stdout, set while the dashboard is live.
+_stream_redirect: IO[str] | None = None
+
+_maintenance_executor: ThreadPoolExecutor | None = None
+_maintenance_lock = threading.Lock()
+
+# One lock per active log file, held while appending, rotating or compressing it.
+_file_locks: dict[str, threading.Lock] = {}
+_file_locks_lock = threading.Lock()
+
+
+def redirect_stream_handlers(stream: IO[str] | None) -> IO[str] | None:
+    """Send the output of every StdoutHandler to `stream`, or back to sys.stdout with None.
+
+    Handlers given their own stream with `setStream` keep it. Returns the previous redirect.
+    """
+    global _stream_redirect
+    previous = _stream_redirect
+    _stream_redirect = stream
+    return previous
+
+
+def _file_lock(filename: str) -> threading.Lock:
+    """Get the lock that serializes the writes, the rotation and the compression of a log file."""
+    lock = _file_locks.get(filename)
+    if lock is None:
+        with _file_locks_lock:
+            lock = _file_locks.setdefault(filename, threading.Lock())
+    return lock
+
+
+def _get_maintenance_executor() -> ThreadPoolExecutor:
+    """Get the shared single worker used for compression and retention jobs."""
+    global _maintenance_executor
+    with _maintenance_lock:
+        if _maintenance_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            _maintenance_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="emo_logger_maintenance")
+        return _maintenance_executor
+
+
+def wait_for_maintenance() -> None:
+    """Block until all queued compression and retention jobs are finished."""
+    if _maintenance_executor is None:
+        return
+    _maintenance_executor.submit(lambda: None).result()
+
+
+def compress_log_file(filename: str, compression: str) -> str:
+    """Compress a closed log file and remove the original.
+
+    The compressed copy is written to a temporary file first and renamed into place,
+    so readers never see a partially written archive. If the archive already exists,
+    e.g. a late write recreated the file of a past day, the file is appended to it as
+    a new gzip member or xz stream, which both readers decompress as one file.
+    """
+    import shutil
+
+    if compression == "gzip":
+        from gzip import open as opener
+    else:
+        from lzma import open as opener
+
+    target = filename + COMPRESSION_SUFFIXES[compression]
+    temp_target = target + ".tmp"
+    with open(temp_target, "wb") as raw:
+        if os.path.exists(target):
+            with open(target, "rb") as archive:
+                shutil.copyfileobj(archive, raw)
+        with open(filename, "rb") as source, opener(raw, "wb") as destination:
+            shutil.copyfileobj(source, destination)
+    os.replace(temp_target, target)
+    os.remove(filename)
+    return target
+
+
+def open_log_file(filename: str) -> IO[str]:
+    """Open a plain or compressed log file for reading as text."""
+    if filename.endswith(COMPRESSION_SUFFIXES["gzip"]):
+        import gzip
+
+        return gzip.open(filename, "rt", encoding="UTF-8")
+    if filename.endswith(COMPRESSION_SUFFIXES["lzma"]):
+        import lzma
+
+        return lzma.open(filename, "rt", encoding="UTF-8")
+    return open(filename, encoding="UTF-8")
+
+
+class _LoggerState:
+    """State of one logger in one thread or asyncio task."""
+
+    __slots__ = ("last_message", "last_message_time", "stack_distance")
+
+    def __init__(self, last_message: object = None, last_message_time: float | None = None, stack_distance: int = 2):
+        self.last_message = last_message
+        self.last_message_time = last_message_time
+        self.stack_distance = stack_distance
+
+    def copy(self) -> _LoggerState:
+        return _LoggerState(self.last_message, self.last_message_time, self.stack_distance)
+
+
+class _ContextStates:
+    """Logger states of the thread or asyncio task that owns them."""
+
+    __slots__ = ("owner", "states")
+
+    def __init__(self, owner: object, states: WeakKeyDictionary[EmoLogger, _LoggerState]):
+        self.owner = owner
+        self.states = states
+
+
+# One variable for all loggers: a context keeps every variable ever set in it, so a
+# variable per logger would pile up in long running threads. The states are weakly
+# keyed, so they go away with their logger.
+_CONTEXT_STATES: ContextVar[_ContextStates | None] = ContextVar("emo_logger_states", default=None)
+_DEFAULT_STATE = _LoggerState()
+
+
+def _context_owner() -> object:
+    """Get the asyncio task running now, or the id of the current thread outside of tasks."""
+    task = current_task()
+    return threading.get_ident() if task is None else task
+
+
+def level_to_filename(level_name: str) -> str:
+    """Get the log file base name used for the given level name."""
+    if level_name in ("START", "END", "DONE"):
+        return "PROCESS"
+    return level_name
+
+
+class StdoutHandler(StreamHandler):
+    """Stream handler writing to `sys.stdout` as it is when each record is written.
+
+    A redirect of `sys.stdout` also gets the records, and `redirect_stream_handlers`
+    takes precedence over `sys.stdout`. A stream given to `setStream` is used instead
+    of both until it is set back to None.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        # StreamHandler.__init__ sets sys.stderr, follow sys.stdout instead.
+        self._stream: IO[str] | None = None
+
+    @property
+    def stream(self) -> IO[str]:  # type: ignore
+        if self._stream is not None:
+            return self._stream
+        if _stream_redirect is not None:
+            return _stream_redirect
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, stream: IO[str] | None) -> None:
+        self._stream = stream
 
 
 class EmoFilter(Filter):
@@ -54,6 +233,9 @@ class EmoFilter(Filter):
     def filter(self, record: object) -> bool:
         """Filter the log message."""
         record.levelemoji = None
+        call = CURRENT_CALL.get()
+        record.call_id = "-" if call is None else call.call_id
+        record.task_name = current_task_name() or "-"
 
         if record.levelname == "DEBUG":
             record.levelemoji = self.emo_DEBUG
@@ -113,8 +295,22 @@ class EmoLogger:
         critical: Log a message with the CRITICAL log level.
         is_enabled_for: Check if the logger is enabled for the given level.
         write_message: Write the log message to the log file.
+        iter_log_files: List the log files of a level for a day, oldest first.
+        read_log_lines: Read the log lines of a level for a day.
         _log: Log a message with the given log level.
-        close: Close the logger."""
+        close: Close the logger.
+
+    Log files live in one folder per day under `{log_folder}/{app_name}/`.
+    When `max_bytes` is set, a file that reaches it is renamed to
+    `{LEVEL}.log.{n}` and a fresh file is started. When `compression` is
+    "gzip" or "lzma", rotated files and the files of past days are compressed
+    on a background thread. `retention_days` and `retention_bytes` remove the
+    oldest day folders, and never the folder of the current day. With
+    `write_to_file` set to False, records only go to the stream handler.
+
+    `last_message`, `last_message_time` and `stack_distance` are kept per
+    thread and per asyncio task, and every record is stamped with the thread,
+    the task and the id of the monitored call it was logged from."""
 
     DONE_INT = INFO + 3
     ERROR_INT = ERROR
@@ -127,8 +323,27 @@ class EmoLogger:
     UNKNOWN_INT = INFO + 5
     TRACE_INT = DEBUG + 1
 
-    def __init__(self, log_folder: str, app_name: str | None, log_level: int = DEBUG) -> None:
+    def __init__(
+        self,
+        log_folder: str,
+        app_name: str | None,
+        log_level: int = DEBUG,
+        max_bytes: int | None = None,
+        compression: str | None = None,
+        retention_days: int | None = None,
+        retention_bytes: int | None = None,
+        write_to_file: bool = True,
+    ) -> None:
+        if (compression is not None) and (compression not in COMPRESSION_SUFFIXES):
+            raise ValueError(f"Unsupported compression '{compression}', use one of {sorted(COMPRESSION_SUFFIXES)}")
+
         self.log_folder = log_folder
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.retention_days = retention_days
+        self.retention_bytes = retention_bytes
+        self.current_date: str | None = None
+        self.write_to_file = write_to_file
 
         if (app_name is None) or (app_name == ""):
             self.app_name = "no_app_name"
@@ -141,12 +356,13 @@ class EmoLogger:
         self.formatter = Formatter(
             "%(levelemoji)s %(levelname)8s | "
             "%(asctime)s | %(name)s | "
+            "%(threadName)s(%(thread)d):%(task_name)s #%(call_id)s | "
             "%(filename)25s:%(lineno)5d | %(funcName)s() "
             "- %(message)s"
         )
 
         self.logger.addFilter(EmoFilter())
-        self.stream_handler = StreamHandler(stdout)
+        self.stream_handler = StdoutHandler()
         self.stream_handler.setFormatter(self.formatter)
         if not self.logger.hasHandlers():
             self.logger.addHandler(self.stream_handler)
@@ -167,66 +383,117 @@ class EmoLogger:
         self.logger.error = self.error  # type: ignore
         self.logger.critical = self.critical  # type: ignore
 
-        self.last_message = None
-        self.last_message_time = None
-        self.stack_distance = 2
+    def _state(self) -> _LoggerState:
+        """Get the state of the logger in the current thread or asyncio task, for reading."""
+        context_states = _CONTEXT_STATES.get()
+        if context_states is None:
+            return _DEFAULT_STATE
+        return context_states.states.get(self, _DEFAULT_STATE)
+
+    def _own_state(self) -> _LoggerState:
+        """Get the state of the logger in the current thread or asyncio task, for writing.
+
+        Threads start with an empty context, but an asyncio task starts with a copy of
+        its parent's, so a task copies the inherited states before its first write.
+        """
+        owner = _context_owner()
+        context_states = _CONTEXT_STATES.get()
+        if (context_states is None) or (context_states.owner != owner):
+            states: WeakKeyDictionary[EmoLogger, _LoggerState] = WeakKeyDictionary()
+            if context_states is not None:
+                for logger, state in context_states.states.items():
+                    states[logger] = state.copy()
+            context_states = _ContextStates(owner, states)
+            _CONTEXT_STATES.set(context_states)
+
+        state = context_states.states.get(self)
+        if state is None:
+            state = context_states.states[self] = _LoggerState()
+        return state
+
+    @property
+    def last_message(self) -> object:
+        """The last message logged from the current thread or asyncio task."""
+        return self._state().last_message
+
+    @last_message.setter
+    def last_message(self, value: object) -> None:
+        self._own_state().last_message = value
+
+    @property
+    def last_message_time(self) -> float | None:
+        """The time of the last message logged from the current thread or asyncio task."""
+        return self._state().last_message_time
+
+    @last_message_time.setter
+    def last_message_time(self, value: float | None) -> None:
+        self._own_state().last_message_time = value
+
+    @property
+    def stack_distance(self) -> int:
+        """The stack distance used in the current thread or asyncio task."""
+        return self._state().stack_distance
+
+    @stack_distance.setter
+    def stack_distance(self, value: int) -> None:
+        self._own_state().stack_distance = value
 
     def set_stack_distance(self, stack_distance: int) -> None:
-        """Set the stack distance for the logger."""
+        """Set the stack distance for the logger in the current thread or asyncio task."""
         self.stack_distance = stack_distance
 
     def template(self, msg, *args, **kwargs):
         pass
 
-    def trace(self, message: str, *args: object) -> None:
+    def trace(self, message: str, *args: object, stacklevel: int = 1) -> None:
         """Log 'message' with severity 'TRACE'."""
         if self.is_enabled_for(self.TRACE_INT):
-            self._log(self.TRACE_INT, message, args)
+            self._log(self.TRACE_INT, message, args, stacklevel=stacklevel)
 
-    def done(self, message: str, *args: object) -> None:
+    def done(self, message: str, *args: object, stacklevel: int = 1) -> None:
         """Log 'message' with severity 'DONE'."""
         if self.is_enabled_for(self.DONE_INT):
-            self._log(self.DONE_INT, message, args)
+            self._log(self.DONE_INT, message, args, stacklevel=stacklevel)
 
-    def start(self, message: str, *args: object) -> None:
+    def start(self, message: str, *args: object, stacklevel: int = 1) -> None:
         """Log 'message' with severity 'START'."""
         if self.is_enabled_for(self.START_INT):
-            self._log(self.START_INT, message, args)
+            self._log(self.START_INT, message, args, stacklevel=stacklevel)
 
-    def end(self, message: str, *args: object) -> None:
+    def end(self, message: str, *args: object, stacklevel: int = 1) -> None:
         """Log 'message' with severity 'END'."""
         if self.is_enabled_for(self.END_INT):
-            self._log(self.END_INT, message, args)
+            self._log(self.END_INT, message, args, stacklevel=stacklevel)
 
-    def unknown(self, message: str, *args: object) -> None:
+    def unknown(self, message: str, *args: object, stacklevel: int = 1) -> None:
         """Log 'message' with severity 'UNKNOWN'."""
         if self.is_enabled_for(self.UNKNOWN_INT):
-            self._log(self.UNKNOWN_INT, message, args)
+            self._log(self.UNKNOWN_INT, message, args, stacklevel=stacklevel)
 
-    def debug(self, message: str, *args: object) -> None:
+    def debug(self, message: str, *args: object, stacklevel: int = 1) -> None:
         """Log 'message' with severity 'DEBUG'."""
         if self.is_enabled_for(self.DEBUG_INT):
-            self._log(self.DEBUG_INT, message, args)
+            self._log(self.DEBUG_INT, message, args, stacklevel=stacklevel)
 
-    def info(self, message: str, *args: object) -> None:
+    def info(self, message: str, *args: object, stacklevel: int = 1) -> None:
         """Log 'message' with severity 'INFO'."""
         if self.is_enabled_for(self.INFO_INT):
-            self._log(self.INFO_INT, message, args)
+            self._log(self.INFO_INT, message, args, stacklevel=stacklevel)
 
-    def warning(self, message: str, *args: object) -> None:
+    def warning(self, message: str, *args: object, stacklevel: int = 1) -> None:
         """Log 'message' with severity 'WARNING'."""
         if self.is_enabled_for(self.WARNING_INT):
-            self._log(self.WARNING_INT, message, args)
+            self._log(self.WARNING_INT, message, args, stacklevel=stacklevel)
 
-    def error(self, message: str, *args: object) -> None:
+    def error(self, message: str, *args: object, stacklevel: int = 1) -> None:
         """Log 'message' with severity 'ERROR'."""
         if self.is_enabled_for(self.ERROR_INT):
-            self._log(self.ERROR_INT, message, args)
+            self._log(self.ERROR_INT, message, args, stacklevel=stacklevel)
 
-    def critical(self, message: str, *args: object) -> None:
+    def critical(self, message: str, *args: object, stacklevel: int = 1) -> None:
         """Log 'message' with severity 'CRITICAL'."""
         if self.is_enabled_for(self.CRITICAL_INT):
-            self._log(self.CRITICAL_INT, message, args)
+            self._log(self.CRITICAL_INT, message, args, stacklevel=stacklevel)
 
     def is_enabled_for(self, level: int):
         """Check if the logger is enabled for the given level."""
@@ -249,22 +516,191 @@ class EmoLogger:
         now = strftime("%H:%M:%S")
         self.last_message_time = time()
         level_name = logging.getLevelName(int(level))
-
-        if level_name in ("START", "END", "DONE"):
-            level_filename = "PROCESS"
-        else:
-            level_filename = level_name
+        level_filename = level_to_filename(level_name)
 
         emo = getattr(EmoFilter(), f"emo_{level_name}")
         folder_name = f"{self.log_folder}/{self.app_name}/{date}"
         if os.path.exists(folder_name) is False:
-            os.makedirs(folder_name)
+            # Another thread may create it between the check and makedirs.
+            os.makedirs(folder_name, exist_ok=True)
         filename = f"{folder_name}/{level_filename}.log"
 
-        with open(filename, "a", encoding="UTF-8") as file:
-            file.write(
-                f"{emo} {now} | {level_name} | {msg} | {args} | {exc_info} | {extra} | {stack_info} | {stacklevel}\n"
+        call = CURRENT_CALL.get()
+        call_id = "-" if call is None else call.call_id
+        # The ident of the thread writing, a context copied into an executor keeps the caller's thread_id.
+        origin = f"{threading.current_thread().name}({threading.get_ident()}):{current_task_name() or '-'}"
+
+        # The size seen after the append is the size the rotation acts on, since both hold the lock.
+        with _file_lock(filename):
+            with open(filename, "a", encoding="UTF-8") as file:
+                file.write(
+                    f"{emo} {now} | {level_name} | {msg} | {args} | {exc_info} | {extra} | {stack_info} | {stacklevel}"
+                    f" | {origin} | {call_id}\n"
+                )
+                size = file.tell()
+
+            if (self.max_bytes is not None) and (size >= self.max_bytes):
+                self._rotate(folder_name, level_filename)
+
+        if date != self.current_date:
+            self.current_date = date
+            if (
+                (self.compression is not None)
+                or (self.retention_days is not None)
+                or (self.retention_bytes is not None)
+            ):
+                self._submit_maintenance(self._maintain_day_folders, date)
+
+    def _submit_maintenance(self, func: Callable[..., object], *args: object) -> None:
+        """Queue a maintenance job and log its failure, since nobody waits for its result."""
+        future = _get_maintenance_executor().submit(func, *args)
+        future.add_done_callback(self._report_maintenance_failure)
+
+    def _report_maintenance_failure(self, future: Future[object]) -> None:
+        """Log a failed maintenance job to the stream only.
+
+        Writing it to a file could rotate that file and queue the failing job again.
+        """
+        exception = future.exception()
+        if exception is None:
+            return
+        logger = logging.getLogger(__name__) if self.logger is None else self.logger
+        logger.log(ERROR, f"Log maintenance failed: {type(exception).__name__}: {exception}", exc_info=exception)
+
+    def _rotate(self, folder_name: str, level_filename: str) -> None:
+        """Move the active log file to the next free index and queue its compression.
+
+        The caller holds the lock of the active file.
+        """
+        filename = f"{folder_name}/{level_filename}.log"
+        index = max(self._rotated_indexes(folder_name, level_filename), default=0) + 1
+        while True:
+            rotated = f"{filename}.{index}"
+            if any(os.path.exists(rotated + suffix) for suffix in COMPRESSION_SUFFIXES.values()):
+                index += 1
+                continue
+            try:
+                # Unlike os.rename, a hard link fails instead of replacing an existing file.
+                os.link(filename, rotated)
+            except FileExistsError:
+                index += 1
+                continue
+            except FileNotFoundError:
+                # Another process writing to the same folder rotated it first.
+                return
+            break
+        os.remove(filename)
+
+        if self.compression is not None:
+            self._submit_maintenance(compress_log_file, rotated, self.compression)
+
+    @staticmethod
+    def _rotated_indexes(folder_name: str, level_filename: str) -> list[int]:
+        """Get the indexes of the rotated files of a level in a day folder."""
+        pattern = re.compile(rf"^{re.escape(level_filename)}\.log\.(\d+)(\.gz|\.xz)?$")
+        indexes = []
+        for name in os.listdir(folder_name):
+            match = pattern.match(name)
+            if match:
+                indexes.append(int(match.group(1)))
+        return indexes
+
+    def _day_folders(self) -> list[str]:
+        """Get the day folder names of the app, oldest first."""
+        app_folder = f"{self.log_folder}/{self.app_name}"
+        if not os.path.isdir(app_folder):
+            return []
+        return sorted(name for name in os.listdir(app_folder) if DAY_FOLDER_PATTERN.match(name))
+
+    def _maintain_day_folders(self, current_date: str) -> None:
+        """Compress the files of past days and apply the retention limits.
+
+        Runs on the maintenance thread, never on the logging thread.
+        """
+        import shutil
+
+        app_folder = f"{self.log_folder}/{self.app_name}"
+        past_days = [day for day in self._day_folders() if day < current_date]
+
+        if self.retention_days is not None:
+            cutoff = strftime(
+                "%Y-%m-%d", localtime(mktime(strptime(current_date, "%Y-%m-%d")) - self.retention_days * 86400)
             )
+            for day in [day for day in past_days if day < cutoff]:
+                shutil.rmtree(f"{app_folder}/{day}", ignore_errors=True)
+                past_days.remove(day)
+
+        if self.compression is not None:
+            suffixes = tuple(COMPRESSION_SUFFIXES.values())
+            for day in past_days:
+                for name in os.listdir(f"{app_folder}/{day}"):
+                    if not name.endswith(suffixes) and not name.endswith(".tmp"):
+                        filename = f"{app_folder}/{day}/{name}"
+                        # Hold the lock of the file, so a late write never lands in a file being removed.
+                        with _file_lock(filename):
+                            if os.path.exists(filename):
+                                compress_log_file(filename, self.compression)
+                        with _file_locks_lock:
+                            _file_locks.pop(filename, None)
+
+        if self.retention_bytes is not None:
+            sizes = {day: self._folder_size(f"{app_folder}/{day}") for day in self._day_folders()}
+            total = sum(sizes.values())
+            for day in past_days:
+                if total <= self.retention_bytes:
+                    break
+                shutil.rmtree(f"{app_folder}/{day}", ignore_errors=True)
+                total -= sizes.get(day, 0)
+
+    @staticmethod
+    def _folder_size(folder_name: str) -> int:
+        """Get the total size in bytes of the files in a folder."""
+        total = 0
+        for entry in os.scandir(folder_name):
+            if entry.is_file():
+                total += entry.stat().st_size
+        return total
+
+    def iter_log_files(self, level_name: str, date: str | None = None) -> list[str]:
+        """List the log files of a level for a day, oldest first.
+
+        Rotated files come first in index order, followed by the active file.
+        A rotated file is listed once, compressed or not, whichever exists. The
+        active file is listed after its archive when both exist, since the plain
+        file then holds the lines written after the archive was made.
+        """
+        if date is None:
+            date = strftime("%Y-%m-%d")
+        level_filename = level_to_filename(level_name)
+        folder_name = f"{self.log_folder}/{self.app_name}/{date}"
+        if not os.path.isdir(folder_name):
+            return []
+
+        filename = f"{folder_name}/{level_filename}.log"
+        files = []
+        for index in sorted(set(self._rotated_indexes(folder_name, level_filename))):
+            for suffix in (*COMPRESSION_SUFFIXES.values(), ""):
+                if os.path.exists(f"{filename}.{index}{suffix}"):
+                    files.append(f"{filename}.{index}{suffix}")
+                    break
+        for suffix in (*COMPRESSION_SUFFIXES.values(), ""):
+            if os.path.exists(filename + suffix):
+                files.append(filename + suffix)
+        return files
+
+    def read_log_lines(self, level_name: str, date: str | None = None) -> Iterator[str]:
+        """Read the log lines of a level for a day, decompressing files as needed."""
+        for filename in self.iter_log_files(level_name, date):
+            try:
+                with open_log_file(filename) as file:
+                    yield from file
+            except FileNotFoundError:
+                # Compressed in the background between listing and opening.
+                for suffix in COMPRESSION_SUFFIXES.values():
+                    if os.path.exists(filename + suffix):
+                        with open_log_file(filename + suffix) as file:
+                            yield from file
+                        break
 
     def _log(
         self,
@@ -277,12 +713,20 @@ class EmoLogger:
         stacklevel: int = 1,
     ):
         """Log 'message' with severity 'TRACE'."""
-        self.last_message = msg
+        state = self._own_state()
+        state.last_message = msg
 
         if self.logger is None:
             return
-        else:
+
+        key = (self.app_name, level)
+        with _record_counts_lock:
+            RECORD_COUNTS[key] = RECORD_COUNTS.get(key, 0) + 1
+
+        if self.write_to_file:
             self.write_message(level, msg, args, exc_info, extra, stack_info, stacklevel)
+        else:
+            state.last_message_time = time()
 
         self.logger.log(
             level=level,
@@ -291,7 +735,7 @@ class EmoLogger:
             exc_info=exc_info,  # type: ignore
             extra=extra,
             stack_info=stack_info,
-            stacklevel=stacklevel + self.stack_distance,
+            stacklevel=stacklevel + state.stack_distance,
         )
 
     def close(self):
@@ -302,6 +746,10 @@ class EmoLogger:
         if self.stream_handler is None:
             return
 
+        context_states = _CONTEXT_STATES.get()
+        if (context_states is not None) and (context_states.owner == _context_owner()):
+            context_states.states.pop(self, None)
+
         self.logger.removeHandler(self.stream_handler)
         self.stream_handler.close()
         self.logger = None
@@ -0,0 +1,553 @@
+"""Method call metrics gathered by the BaseClass monitor.
+
+The monitor records every call into a `MethodStats` object that is resolved once,
+when the method is wrapped, so the hot path only does a bisect and a few counter
+increments under a per-method lock. Exporters never take that lock: they copy
+the counters and render the copy in OpenMetrics/Prometheus text format.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, NamedTuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_PREFIX = "abm_method"
+# Busy time is tracked per thread for at most this many live threads per method.
+MAX_THREAD_SERIES = 32
+OTHER_THREADS = "other"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Caches the Thread object of each thread, a thread local lookup is cheaper than current_thread().
+_THREADS = threading.local()
+
+
+class MethodSnapshot(NamedTuple):
+    """Point in time copy of the metrics of one method."""
+
+    name: str
+    calls: int
+    errors: int
+    total_seconds: float
+    bucket_counts: tuple[int, ...]
+    failure_seconds: float
+    failure_bucket_counts: tuple[int, ...]
+    exceptions: dict[str, int]
+    short_circuits: int
+    cancellations: int
+    in_flight: int
+    max_in_flight: int
+    contended_calls: int
+    wall_seconds: float
+    thread_seconds: dict[tuple[int | None, str], float]
+
+
+class MethodStats:
+    """Call count, error count and latency histograms of one monitored method.
+
+    Successful and failed calls are kept in separate histograms, and failures are
+    also counted per exception type. Calls interrupted by a BaseException that is not
+    an Exception, such as KeyboardInterrupt or asyncio.CancelledError, are only
+    counted as cancellations. `enter` and `leave` also track the calls in
+    flight, the calls that started while another call of the same method was
+    running, and the busy time per thread. The busy time is kept for at most
+    MAX_THREAD_SERIES live threads, the time of finished threads and of any thread
+    beyond that limit is folded into one OTHER_THREADS entry. Calls left with
+    `busy=False`, such as coroutines whose wall time includes the time spent
+    awaiting, are counted but add no busy time.
+    """
+
+    __slots__ = (
+        "name",
+        "total_seconds",
+        "bucket_counts",
+        "failure_seconds",
+        "failure_bucket_counts",
+        "exceptions",
+        "short_circuits",
+        "cancellations",
+        "max_in_flight",
+        "contended_calls",
+        "first_call_time",
+        "thread_seconds",
+        "_running",
+        "_lock",
+    )
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.total_seconds = 0.0
+        # One slot per bucket bound plus a trailing +Inf slot, allocated once.
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.failure_seconds = 0.0
+        self.failure_bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.exceptions: dict[str, int] = {}
+        self.short_circuits = 0
+        self.cancellations = 0
+        self.max_in_flight = 0
+        self.contended_calls = 0
+        self.first_call_time: float | None = None
+        # Keyed by Thread object rather than ident, since idents are reused.
+        self.thread_seconds: dict[threading.Thread | str, float] = {}
+        # The calls in flight, as the length of a list of None. `append` and `pop` are atomic and
+        # reuse the list's memory, so `enter` counts a call without the lock or an allocation.
+        self._running: list[None] = []
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calls running now."""
+        return len(self._running)
+
+    def _count(self, seconds: float, error: bool, exception_type: str | None) -> None:
+        """Count one call, the caller holds the lock."""
+        index = bisect_left(LATENCY_BUCKETS, seconds)
+        if error:
+            self.failure_seconds += seconds
+            self.failure_bucket_counts[index] += 1
+            exception_type = exception_type or "unknown"
+            self.exceptions[exception_type] = self.exceptions.get(exception_type, 0) + 1
+        else:
+            self.total_seconds += seconds
+            self.bucket_counts[index] += 1
+
+    def record(self, seconds: float, error: bool = False, exception_type: str | None = None) -> None:
+        """Record one call that took `seconds`."""
+        with self._lock:
+            self._count(seconds, error, exception_type)
+
+    def short_circuit(self) -> None:
+        """Count one call rejected by a circuit breaker."""
+        with self._lock:
+            self.short_circuits += 1
+
+    def enter(self) -> int:
+        """Mark the start of a call, returns the calls in flight to pass to `leave`."""
+        if self.first_call_time is None:
+            self.first_call_time = time.perf_counter()
+        self._running.append(None)
+        return len(self._running)
+
+    def leave(
+        self,
+        running: int,
+        seconds: float,
+        error: bool = False,
+        exception_type: str | None = None,
+        busy: bool = True,
+        cancelled: bool = False,
+    ) -> None:
+        """Mark the end of a call that took `seconds`, `running` is what its `enter` returned.
+
+        With `busy` False the call adds no busy time to its thread. A `cancelled` call
+        is counted as a cancellation rather than as a call.
+        """
+        thread = None
+        if busy:
+            try:
+                thread = _THREADS.current
+            except AttributeError:
+                thread = _THREADS.current = threading.current_thread()
+        with self._lock:
+            self._running.pop()
+            if running > 1:
+                self.contended_calls += 1
+            if running > self.max_in_flight:
+                self.max_in_flight = running
+            if cancelled:
+                self.cancellations += 1
+            elif error:
+                self._count(seconds, error, exception_type)
+            else:
+                # Same as _count, inlined since every successful monitored call runs it.
+                self.total_seconds += seconds
+                self.bucket_counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            if thread is None:
+                return
+            if thread in self.thread_seconds:
+                self.thread_seconds[thread] += seconds
+            else:
+                self._add_thread(thread, seconds)
+
+    def _add_thread(self, thread: threading.Thread, seconds: float) -> None:
+        """Start the busy time of a thread, folding finished threads first. The caller holds the lock."""
+        other = 0.0
+        for key in [key for key in self.thread_seconds if isinstance(key, threading.Thread) and (not key.is_alive())]:
+            other += self.thread_seconds.pop(key)
+        if len(self.thread_seconds) - (OTHER_THREADS in self.thread_seconds) >= MAX_THREAD_SERIES:
+            other += seconds
+        else:
+            self.thread_seconds[thread] = seconds
+        if other:
+            self.thread_seconds[OTHER_THREADS] = self.thread_seconds.get(OTHER_THREADS, 0.0) + other
+
+    def reset(self) -> None:
+        """Zero the counters, keeping the calls in flight so their `leave` still balances."""
+        with self._lock:
+            self.total_seconds = 0.0
+            self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+            self.failure_seconds = 0.0
+            self.failure_bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+            self.exceptions = {}
+            self.short_circuits = 0
+            self.cancellations = 0
+            self.max_in_flight = len(self._running)
+            self.contended_calls = 0
+            self.first_call_time = None if not self._running else time.perf_counter()
+            self.thread_seconds = {}
+
+    def thread_busy_seconds(self) -> dict[tuple[int | None, str], float]:
+        """Copy the busy time per `(thread ident, thread name)`, without taking the lock.
+
+        Threads that finished are reported under `(None, OTHER_THREADS)`.
+        """
+        busy: dict[tuple[int | None, str], float] = {}
+        for thread, seconds in self.thread_seconds.copy().items():
+            if isinstance(thread, str) or (not thread.is_alive()):
+                key = (None, OTHER_THREADS)
+            else:
+                key = (thread.ident, thread.name)
+            busy[key] = busy.get(key, 0.0) + seconds
+        return busy
+
+    def snapshot(self) -> MethodSnapshot:
+        """Copy the counters without taking the lock."""
+        bucket_counts = tuple(self.bucket_counts)
+        failure_bucket_counts = tuple(self.failure_bucket_counts)
+        first_call_time = self.first_call_time
+        return MethodSnapshot(
+            name=self.name,
+            calls=sum(bucket_counts) + sum(failure_bucket_counts),
+            errors=sum(failure_bucket_counts),
+            total_seconds=self.total_seconds,
+            bucket_counts=bucket_counts,
+            failure_seconds=self.failure_seconds,
+            failure_bucket_counts=failure_bucket_counts,
+            exceptions=self.exceptions.copy(),
+            short_circuits=self.short_circuits,
+            cancellations=self.cancellations,
+            in_flight=self.in_flight,
+            max_in_flight=self.max_in_flight,
+            contended_calls=self.contended_calls,
+            wall_seconds=0.0 if first_call_time is None else time.perf_counter() - first_call_time,
+            thread_seconds=self.thread_busy_seconds(),
+        )
+
+
+class MetricsRegistry:
+    """Registry of the `MethodStats` of all monitored methods."""
+
+    def __init__(self) -> None:
+        self._methods: dict[str, MethodStats] = {}
+        self._lock = threading.Lock()
+
+    def method(self, name: str) -> MethodStats:
+        """Get or create the stats of the method with the given name."""
+        stats = self._methods.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self._methods.setdefault(name, MethodStats(name))
+        return stats
+
+    def snapshot(self) -> list[MethodSnapshot]:
+        """Get a snapshot of every method, sorted by name."""
+        return [stats.snapshot() for _, stats in sorted(self._methods.copy().items())]
+
+    def reset(self) -> None:
+        """Zero the recorded metrics of every method.
+
+        The `MethodStats` objects are kept, since each monitored method holds on to
+        the one it was given when it was wrapped.
+        """
+        for stats in self._methods.copy().values():
+            stats.reset()
+
+
+METRICS = MetricsRegistry()
+
+
+def histogram_percentile(bucket_counts: tuple[int, ...], quantile: float) -> float | None:
+    """Estimate a percentile of a LATENCY_BUCKETS histogram.
+
+    The value is interpolated linearly inside the bucket that holds the rank, like
+    Prometheus' histogram_quantile. Ranks in the +Inf bucket return the largest bound.
+    """
+    total = sum(bucket_counts)
+    if total == 0:
+        return None
+
+    rank = quantile * total
+    cumulative = 0
+    lower = 0.0
+    for bound, count in zip(LATENCY_BUCKETS, bucket_counts):
+        if count and cumulative + count >= rank:
+            return lower + (bound - lower) * (rank - cumulative) / count
+        cumulative += count
+        lower = bound
+    return LATENCY_BUCKETS[-1]
+
+
+def utilization_report(registry: MetricsRegistry | None = None) -> dict[str, dict[str, Any]]:
+    """Report the per thread utilization and the contention of every monitored method.
+
+    The utilization of a thread is the share of the wall time since the first call
+    of the method that the thread spent inside it. Coroutine methods list no threads,
+    since the time they spend awaiting is not time the event loop thread is busy.
+    """
+    if registry is None:
+        registry = METRICS
+    report = {}
+    for snapshot in registry.snapshot():
+        if snapshot.calls == 0:
+            continue
+        wall_seconds = snapshot.wall_seconds
+        report[snapshot.name] = {
+            "calls": snapshot.calls,
+            "in_flight": snapshot.in_flight,
+            "max_in_flight": snapshot.max_in_flight,
+            "contended_calls": snapshot.contended_calls,
+            "contention_ratio": snapshot.contended_calls / snapshot.calls,
+            "threads": [
+                {
+                    "thread_id": thread_id,
+                    "thread_name": thread_name,
+                    "busy_seconds": seconds,
+                    "utilization": seconds / wall_seconds if wall_seconds > 0 else 0.0,
+                }
+                for (thread_id, thread_name), seconds in sorted(
+                    snapshot.thread_seconds.items(), key=lambda item: (item[0][0] is None, item[0])
+                )
+            ],
+        }
+    return report
+
+
+def failure_report(registry: MetricsRegistry | None = None) -> dict[str, dict[str, Any]]:
+    """Report the error rate and the failure latency next to the success latency of every method."""
+    if registry is None:
+        registry = METRICS
+
+    report = {}
+    for snapshot in registry.snapshot():
+        if snapshot.calls == 0 and snapshot.short_circuits == 0 and snapshot.cancellations == 0:
+            continue
+        successes = snapshot.calls - snapshot.errors
+        report[snapshot.name] = {
+            "calls": snapshot.calls,
+            "errors": snapshot.errors,
+            "error_rate": snapshot.errors / snapshot.calls if snapshot.calls else 0.0,
+            "mean_success_seconds": snapshot.total_seconds / successes if successes else 0.0,
+            "mean_failure_seconds": snapshot.failure_seconds / snapshot.errors if snapshot.errors else 0.0,
+            "exceptions": dict(sorted(snapshot.exceptions.items())),
+            "short_circuits": snapshot.short_circuits,
+            "cancellations": snapshot.cancellations,
+        }
+    return report
+
+
+def _escape_label(value: str) -> str:
+    """Escape a label value for the text exposition format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_histogram(name: str, help_text: str, series: list[tuple[str, tuple[int, ...], float]]) -> list[str]:
+    """Render one histogram family with a series per method."""
+    lines = [f"# TYPE {name} histogram", f"# UNIT {name} seconds", f"# HELP {name} {help_text}"]
+    for method, bucket_counts, total_seconds in series:
+        label = f'method="{_escape_label(method)}"'
+        cumulative = 0
+        for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), bucket_counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{label}}} {total_seconds}")
+        lines.append(f"{name}_count{{{label}}} {cumulative}")
+    return lines
+
+
+def render_openmetrics(registry: MetricsRegistry | None = None) -> str:
+    """Render the metrics of the registry in OpenMetrics text format."""
+    if registry is None:
+        registry = METRICS
+    snapshots = registry.snapshot()
+
+    lines = [
+        f"# TYPE {METRIC_PREFIX}_calls counter",
+        f"# HELP {METRIC_PREFIX}_calls Number of monitored method calls.",
+    ]
+    for snapshot in snapshots:
+        lines.append(f'{METRIC_PREFIX}_calls_total{{method="{_escape_label(snapshot.name)}"}} {snapshot.calls}')
+
+    lines += [
+        f"# TYPE {METRIC_PREFIX}_errors counter",
+        f"# HELP {METRIC_PREFIX}_errors Number of monitored method calls that raised.",
+    ]
+    for snapshot in snapshots:
+        lines.append(f'{METRIC_PREFIX}_errors_total{{method="{_escape_label(snapshot.name)}"}} {snapshot.errors}')
+
+    lines += [
+        f"# TYPE {METRIC_PREFIX}_exceptions counter",
+        f"# HELP {METRIC_PREFIX}_exceptions Number of monitored method calls that raised, per exception type.",
+    ]
+    for snapshot in snapshots:
+        for exception_type, count in sorted(snapshot.exceptions.items()):
+            lines.append(
+                f'{METRIC_PREFIX}_exceptions_total{{method="{_escape_label(snapshot.name)}",'
+                f'exception="{_escape_label(exception_type)}"}} {count}'
+            )
+
+    lines += [
+        f"# TYPE {METRIC_PREFIX}_short_circuits counter",
+        f"# HELP {METRIC_PREFIX}_short_circuits Number of calls rejected by a circuit breaker.",
+    ]
+    for snapshot in snapshots:
+        lines.append(
+            f'{METRIC_PREFIX}_short_circuits_total{{method="{_escape_label(snapshot.name)}"}} {snapshot.short_circuits}'
+        )
+
+    lines += [
+        f"# TYPE {METRIC_PREFIX}_cancellations counter",
+        f"# HELP {METRIC_PREFIX}_cancellations Number of calls interrupted by a cancellation, interrupt or exit.",
+    ]
+    for snapshot in snapshots:
+        lines.append(
+            f'{METRIC_PREFIX}_cancellations_total{{method="{_escape_label(snapshot.name)}"}} {snapshot.cancellations}'
+        )
+
+    lines += _render_histogram(
+        f"{METRIC_PREFIX}_duration_seconds",
+        "Duration of monitored method calls that returned.",
+        [(snapshot.name, snapshot.bucket_counts, snapshot.total_seconds) for snapshot in snapshots],
+    )
+    lines += _render_histogram(
+        f"{METRIC_PREFIX}_failure_duration_seconds",
+        "Duration of monitored method calls that raised.",
+        [(snapshot.name, snapshot.failure_bucket_counts, snapshot.failure_seconds) for snapshot in snapshots],
+    )
+
+    lines += [
+        f"# TYPE {METRIC_PREFIX}_in_flight gauge",
+        f"# HELP {METRIC_PREFIX}_in_flight Number of monitored method calls running now.",
+    ]
+    for snapshot in snapshots:
+        lines.append(f'{METRIC_PREFIX}_in_flight{{method="{_escape_label(snapshot.name)}"}} {snapshot.in_flight}')
+
+    lines += [
+        f"# TYPE {METRIC_PREFIX}_contended_calls counter",
+        f"# HELP {METRIC_PREFIX}_contended_calls Calls started while another call of the method was running.",
+    ]
+    for snapshot in snapshots:
+        lines.append(
+            f'{METRIC_PREFIX}_contended_calls_total{{method="{_escape_label(snapshot.name)}"}} '
+            f"{snapshot.contended_calls}"
+        )
+
+    lines += [
+        f"# TYPE {METRIC_PREFIX}_thread_busy_seconds counter",
+        f"# UNIT {METRIC_PREFIX}_thread_busy_seconds seconds",
+        f"# HELP {METRIC_PREFIX}_thread_busy_seconds Time spent inside the method per thread.",
+    ]
+    for snapshot in snapshots:
+        for (thread_id, thread_name), seconds in snapshot.thread_seconds.items():
+            thread_label = "" if thread_id is None else thread_id
+            lines.append(
+                f'{METRIC_PREFIX}_thread_busy_seconds_total{{method="{_escape_label(snapshot.name)}",'
+                f'thread_id="{thread_label}",thread="{_escape_label(thread_name)}"}} {seconds}'
+            )
+
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serve the metrics on `/metrics` from a background `http.server` thread."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9464, registry: MetricsRegistry | None = None) -> None:
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._server = None
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> MetricsServer:
+        """Start serving. With port 0 a free port is picked and stored in `port`."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self.registry
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = render_openmetrics(registry).encode("UTF-8")
+                self.send_response(200)
+                self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), MetricsHandler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="abm_metrics_server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._thread = None
+
+
+class MetricsFileDumper:
+    """Periodically write the metrics to a file from a background thread.
+
+    The file is replaced atomically, so a reader never sees a partial dump.
+    """
+
+    def __init__(self, filepath: str, interval: float = 15.0, registry: MetricsRegistry | None = None) -> None:
+        self.filepath = filepath
+        self.interval = interval
+        self.registry = registry
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def dump(self) -> None:
+        """Write the current metrics to the file."""
+        path = os.path.dirname(self.filepath)
+        if path and not os.path.exists(path):
+            os.makedirs(path)
+        temp_filepath = f"{self.filepath}.tmp"
+        with open(temp_filepath, "w", encoding="UTF-8") as file:
+            file.write(render_openmetrics(self.registry))
+        os.replace(temp_filepath, self.filepath)
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.dump()
+
+    def start(self) -> MetricsFileDumper:
+        """Start dumping every `interval` seconds."""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="abm_metrics_dumper", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop dumping and write a final dump."""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self.dump()
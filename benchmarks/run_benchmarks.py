@@ -0,0 +1,362 @@
+"""Benchmark suite for the logging, monitoring and DictIO hot paths.
+
+Usage:
+    python -m benchmarks.run_benchmarks run --output results.json
+    python -m benchmarks.run_benchmarks compare baseline.json results.json --threshold 0.1
+
+Every benchmark runs once untimed to warm up, then is repeated, and the median is
+reported with the interquartile range of the repeats as its spread. `compare` exits
+with status 1 when a metric moved in the bad direction by more than the threshold
+and by more than the spread of the two runs, so noise alone is not flagged. Derived
+metrics, such as the overhead computed as the difference of two medians, are
+reported but never flagged, since their raw measurements are compared already.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from statistics import median, quantiles
+from typing import Any, Callable
+
+from rich.console import Console
+
+from abm_common_functions.base_class import BaseClass
+from abm_common_functions.cli_text_format import Dashboard
+from abm_common_functions.dict_io import DictIO
+from abm_common_functions.emo_logger import EmoLogger
+
+LOG_LEVELS = ("TRACE", "DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL", "START", "END", "DONE")
+DICT_SIZES = (100, 1_000, 10_000)
+FULL_DICT_SIZES = (100, 1_000, 10_000, 100_000)
+VALUE_TYPES = ("int", "str", "list", "dict")
+IMPORT_TARGETS = {
+    "package": "abm_common_functions",
+    "dict_io": "abm_common_functions.dict_io",
+    "cli_text_format": "abm_common_functions.cli_text_format",
+}
+DEFAULT_THRESHOLD = 0.10
+
+
+def _result(
+    value: float, unit: str, higher_is_better: bool, derived: bool = False, spread: float = 0.0
+) -> dict[str, Any]:
+    """Build a single benchmark result entry, `spread` is the IQR of its repeats in `unit`."""
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better, "derived": derived, "spread": spread}
+
+
+def _summary(values: list[float], unit: str, higher_is_better: bool) -> dict[str, Any]:
+    """Build a result entry from the values of the repeats, their median and interquartile range."""
+    spread = 0.0
+    if len(values) > 1:
+        first_quartile, _, third_quartile = quantiles(values, n=4)
+        spread = third_quartile - first_quartile
+    return _result(median(values), unit, higher_is_better, spread=spread)
+
+
+def _timings(func: Callable[[], object], repeat: int) -> list[float]:
+    """Get the wall times in seconds of `repeat` calls of func, after one untimed warm-up call."""
+    func()
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start_time)
+    return timings
+
+
+def _silence(logger: EmoLogger, devnull: Any) -> None:
+    """Send the stream output of the logger to devnull."""
+    if logger.stream_handler is not None:
+        logger.stream_handler.setStream(devnull)
+
+
+def bench_logger(log_folder: str, records: int, repeat: int, devnull: Any) -> dict[str, dict[str, Any]]:
+    """Measure EmoLogger records per second per level, with file output on and off."""
+    results = {}
+    for write_to_file in (True, False):
+        output = "file" if write_to_file else "nofile"
+        logger = EmoLogger(log_folder, f"bench_logger_{output}", write_to_file=write_to_file)
+        _silence(logger, devnull)
+        for level_name in LOG_LEVELS:
+            log = getattr(logger, level_name.lower())
+
+            def run(log: Callable[[str], None] = log) -> None:
+                for _ in range(records):
+                    log("benchmark message")
+
+            rates = [records / seconds for seconds in _timings(run, repeat)]
+            results[f"logger.{output}.{level_name}.records_per_second"] = _summary(rates, "records/s", True)
+        logger.close()
+    return results
+
+
+class _BareWorker:
+    def work(self, value: int) -> int:
+        return value + 1
+
+
+class _MonitoredWorker(BaseClass):
+    def __init__(self, logger: EmoLogger | None = None):
+        if logger is not None:
+            self.logger = logger
+
+    def work(self, value: int) -> int:
+        return value + 1
+
+
+def bench_monitor(log_folder: str, calls: int, repeat: int, devnull: Any) -> dict[str, dict[str, Any]]:
+    """Measure the per-call overhead of BaseClass._monitor_function over a bare method."""
+    logger = EmoLogger(log_folder, "bench_monitor")
+    _silence(logger, devnull)
+    workers = {
+        "bare": _BareWorker(),
+        "monitored_nologger": _MonitoredWorker(),
+        "monitored": _MonitoredWorker(logger),
+    }
+
+    per_call = {}
+    for name, worker in workers.items():
+        work = worker.work
+
+        def run(work: Callable[[int], int] = work) -> None:
+            for i in range(calls):
+                work(i)
+
+        per_call[name] = [seconds / calls * 1e9 for seconds in _timings(run, repeat)]
+
+    # Same workloads while the live dashboard refreshes on its own thread. The logger of the
+    # second one keeps its default stream, so its records go to the dashboard like any other.
+    dashboard_logger = EmoLogger(log_folder, "bench_monitor_dashboard")
+    dashboard_workers = {
+        "monitored_dashboard": _MonitoredWorker(),
+        "monitored_dashboard_logger": _MonitoredWorker(dashboard_logger),
+    }
+    dashboard = Dashboard(console=Console(file=devnull, force_terminal=True)).start()
+    try:
+        for name, worker in dashboard_workers.items():
+            work = worker.work
+
+            def run_with_dashboard(work: Callable[[int], int] = work) -> None:
+                for i in range(calls):
+                    work(i)
+
+            per_call[name] = [seconds / calls * 1e9 for seconds in _timings(run_with_dashboard, repeat)]
+    finally:
+        dashboard.stop()
+        dashboard_logger.close()
+
+    results = {f"monitor.{name}.ns_per_call": _summary(values, "ns", False) for name, values in per_call.items()}
+    ns_per_call = {name: median(values) for name, values in per_call.items()}
+    dashboard_overhead = ns_per_call["monitored_dashboard"] - ns_per_call["monitored_nologger"]
+    results["monitor.dashboard.overhead_ns"] = _result(dashboard_overhead, "ns", False, derived=True)
+    dashboard_logger_overhead = ns_per_call["monitored_dashboard_logger"] - ns_per_call["monitored"]
+    results["monitor.dashboard_logger.overhead_ns"] = _result(dashboard_logger_overhead, "ns", False, derived=True)
+    for name in ("monitored_nologger", "monitored"):
+        overhead = ns_per_call[name] - ns_per_call["bare"]
+        results[f"monitor.{name}.overhead_ns"] = _result(overhead, "ns", False, derived=True)
+    logger.close()
+    return results
+
+
+def make_payload(size: int, value_type: str, seed: int = 0) -> dict[str, Any]:
+    """Build a reproducible dict of the given size and value type."""
+    rng = random.Random(seed)
+    payload: dict[str, Any] = {}
+    for i in range(size):
+        if value_type == "int":
+            value: Any = rng.randint(0, 1_000_000)
+        elif value_type == "str":
+            value = "".join(rng.choices(string.ascii_letters, k=32))
+        elif value_type == "list":
+            value = [rng.random() for _ in range(8)]
+        elif value_type == "dict":
+            value = {"id": i, "score": rng.random(), "name": f"item_{i}"}
+        else:
+            raise ValueError(f"Unknown value type '{value_type}'")
+        payload[f"key_{i}"] = value
+    return payload
+
+
+def _peak_memory(func: Callable[[], object]) -> int:
+    """Get the peak traced memory in bytes while calling func."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_dict_io(folder: str, sizes: tuple[int, ...], repeat: int, devnull: Any) -> dict[str, dict[str, Any]]:
+    """Measure DictIO save/load latency and peak memory across dict sizes and value types."""
+    results = {}
+    for value_type in VALUE_TYPES:
+        for size in sizes:
+            filepath = os.path.join(folder, f"bench_{value_type}_{size}.pickle")
+            store = DictIO(filepath)
+            _silence(store.logger, devnull)
+            store.data.update(make_payload(size, value_type))
+
+            def save(store: DictIO = store) -> None:
+                store["_bench_dirty"] = time.time()
+                store.save()
+
+            def load(store: DictIO = store) -> None:
+                store.load(overwrite=True)
+
+            prefix = f"dict_io.{value_type}.{size}"
+            results[f"{prefix}.save_ms"] = _summary([seconds * 1e3 for seconds in _timings(save, repeat)], "ms", False)
+            results[f"{prefix}.load_ms"] = _summary([seconds * 1e3 for seconds in _timings(load, repeat)], "ms", False)
+            results[f"{prefix}.save_peak_bytes"] = _result(_peak_memory(save), "bytes", False)
+            results[f"{prefix}.load_peak_bytes"] = _result(_peak_memory(load), "bytes", False)
+    return results
+
+
+def import_time_us(module: str) -> int:
+    """Get the cumulative `-X importtime` of a module in a fresh interpreter, in us."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in completed.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1])
+    raise RuntimeError(f"No -X importtime line for '{module}'")
+
+
+def bench_import(repeat: int) -> dict[str, dict[str, Any]]:
+    """Measure the import time of the package and its heavier submodules."""
+    results = {}
+    for name, module in IMPORT_TARGETS.items():
+        # The first import fills the bytecode and filesystem caches, so it is left out.
+        import_time_us(module)
+        microseconds = [float(import_time_us(module)) for _ in range(repeat)]
+        results[f"import.{name}.us"] = _summary(microseconds, "us", False)
+    return results
+
+
+def run_benchmarks(quick: bool = False) -> dict[str, Any]:
+    """Run the whole suite and return the results document."""
+    records = 500 if quick else 5_000
+    calls = 2_000 if quick else 20_000
+    repeat = 15 if quick else 25
+    sizes = DICT_SIZES if quick else FULL_DICT_SIZES
+
+    results: dict[str, dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory() as folder, open(os.devnull, "w") as devnull:
+        BaseClass.set_global_log_data(os.path.join(folder, "logs"), "bench")
+        results.update(bench_logger(os.path.join(folder, "logs"), records, repeat, devnull))
+        results.update(bench_monitor(os.path.join(folder, "logs"), calls, repeat, devnull))
+        results.update(bench_dict_io(os.path.join(folder, "stores"), sizes, repeat, devnull))
+    results.update(bench_import(repeat))
+
+    return {
+        "metadata": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def compare_results(
+    baseline: dict[str, Any], current: dict[str, Any], threshold: float = DEFAULT_THRESHOLD
+) -> list[dict[str, Any]]:
+    """Compare two results documents.
+
+    Returns one row per metric present in both, with the relative change, the relative
+    noise and whether it is a regression, i.e. a move in the bad direction larger than
+    both the threshold and the noise. The noise is the sum of the spreads of the two
+    runs relative to the baseline. A move away from a baseline of 0 is an infinite
+    change. Derived metrics are never regressions.
+    """
+    rows = []
+    for name, base in sorted(baseline["results"].items()):
+        if name not in current["results"]:
+            continue
+        base_value = base["value"]
+        current_value = current["results"][name]["value"]
+        if base_value == current_value:
+            change = 0.0
+        elif base_value == 0:
+            change = math.copysign(math.inf, current_value)
+        else:
+            change = (current_value - base_value) / abs(base_value)
+        worse = -change if base["higher_is_better"] else change
+        spread = base.get("spread", 0.0) + current["results"][name].get("spread", 0.0)
+        noise = spread / abs(base_value) if base_value != 0 else 0.0
+        derived = base.get("derived", False) or current["results"][name].get("derived", False)
+        rows.append(
+            {
+                "name": name,
+                "baseline": base_value,
+                "current": current_value,
+                "unit": base["unit"],
+                "change": change,
+                "noise": noise,
+                "derived": derived,
+                "regression": (not derived) and (worse > threshold) and (worse > noise),
+            }
+        )
+    return rows
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks and write the results as JSON.")
+    run_parser.add_argument("--output", default="benchmark_results.json")
+    run_parser.add_argument("--quick", action="store_true", help="Use fewer iterations and smaller dicts.")
+
+    compare_parser = commands.add_parser("compare", help="Compare two results files and flag regressions.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        document = run_benchmarks(quick=args.quick)
+        with open(args.output, "w", encoding="UTF-8") as file:
+            json.dump(document, file, indent=2, sort_keys=True)
+        print(f"Wrote {len(document['results'])} results to {args.output}")
+        return 0
+
+    with open(args.baseline, encoding="UTF-8") as file:
+        baseline = json.load(file)
+    with open(args.current, encoding="UTF-8") as file:
+        current = json.load(file)
+
+    rows = compare_results(baseline, current, args.threshold)
+    for row in rows:
+        flag = "REGRESSION ❌" if row["regression"] else ("(derived)" if row["derived"] else "")
+        print(
+            f"{row['name']:60s} {row['baseline']:14.3f} -> {row['current']:14.3f} {row['unit']:10s} "
+            f"{row['change']:+8.1%} ±{row['noise']:<7.1%} {flag}"
+        )
+    regressions = [row for row in rows if row["regression"]]
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%} and the noise")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,14 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
 from abm_common_functions.base_class import BaseClass
+from abm_common_functions.call_context import CURRENT_CALL
+from abm_common_functions.circuit_breaker import CircuitBreaker, CircuitOpenError
+from abm_common_functions.metrics import METRICS, OTHER_THREADS, failure_report, utilization_report
 
 
 class test_class(BaseClass):
@@ -31,3 +41,263 @@ def test_func2():
     obj = test_class()
     assert obj.test_func2() == (1, 2)
     assert obj.test_func2(3, 4) == (3, 4)
+
+
+class threaded_class(BaseClass):
+    """Testing the monitoring from many threads and tasks."""
+
+    def __init__(self, log_folder):
+        super().__init__(log_folder, "threaded")
+
+    def current_call(self):
+        return CURRENT_CALL.get()
+
+    def slow(self, seconds):
+        time.sleep(seconds)
+        return self.logger.last_message
+
+    async def slow_async(self, seconds):
+        await asyncio.sleep(seconds)
+        return CURRENT_CALL.get()
+
+
+def test_call_context(tmp_path):
+    obj = threaded_class(str(tmp_path))
+    call = obj.current_call()
+    assert call.method == f"{__name__}.threaded_class.current_call"
+    assert call.parent_call_id is None
+    assert CURRENT_CALL.get() is None
+
+
+def test_threads_keep_their_own_state(tmp_path):
+    obj = threaded_class(str(tmp_path))
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        last_messages = list(executor.map(obj.slow, [0.05] * 8))
+    assert last_messages == ["Starting 'slow'"] * 8
+
+    report = utilization_report()[f"{__name__}.threaded_class.slow"]
+    assert report["calls"] >= 8
+    assert report["max_in_flight"] >= 2
+    assert report["contended_calls"] >= 1
+    # The pool threads have finished, so their busy time is folded into one entry.
+    assert [thread["thread_name"] for thread in report["threads"]] == [OTHER_THREADS]
+    assert report["threads"][0]["busy_seconds"] >= 8 * 0.05
+
+
+def test_async_tasks_are_attributed_separately(tmp_path):
+    obj = threaded_class(str(tmp_path))
+
+    async def run():
+        return await asyncio.gather(
+            asyncio.create_task(obj.slow_async(0.05), name="task_a"),
+            asyncio.create_task(obj.slow_async(0.05), name="task_b"),
+        )
+
+    before = METRICS.method(f"{__name__}.threaded_class.slow_async").snapshot().total_seconds
+    calls = asyncio.run(run())
+    assert [call.task_name for call in calls] == ["task_a", "task_b"]
+    assert calls[0].call_id != calls[1].call_id
+    assert METRICS.method(f"{__name__}.threaded_class.slow_async").snapshot().total_seconds - before >= 0.1
+
+
+def test_async_methods_add_no_thread_busy_time(tmp_path):
+    obj = threaded_class(str(tmp_path))
+
+    async def run():
+        await asyncio.gather(*(obj.slow_async(0.05) for _ in range(10)))
+
+    asyncio.run(run())
+    report = utilization_report()[f"{__name__}.threaded_class.slow_async"]
+    assert report["max_in_flight"] >= 10
+    assert report["threads"] == []
+
+
+def test_monitor_records_point_at_the_caller(tmp_path, caplog):
+    obj = threaded_class(str(tmp_path))
+    with caplog.at_level(logging.INFO, logger="threaded"):
+        obj.current_call()
+    records = [record for record in caplog.records if record.levelname in ("START", "END", "DONE")]
+    assert [record.funcName for record in records] == ["test_monitor_records_point_at_the_caller"] * 3
+    assert len({record.call_id for record in records}) == 1
+
+
+class failing_class(BaseClass):
+    """Testing the failure monitoring."""
+
+    def __init__(self, log_folder, breaker=None):
+        super().__init__(log_folder, "failing")
+        if breaker is not None:
+            self.circuit_breaker = breaker
+
+    def fail(self):
+        raise KeyError("missing")
+
+    def maybe_fail(self, should_fail):
+        if should_fail:
+            raise ValueError("asked to fail")
+        return "ok"
+
+    def interrupt(self):
+        raise KeyboardInterrupt
+
+
+def test_failures_are_recorded_and_logged(tmp_path):
+    obj = failing_class(str(tmp_path))
+    before = METRICS.method(f"{__name__}.failing_class.fail").snapshot()
+    for _ in range(3):
+        with pytest.raises(KeyError):
+            obj.fail()
+
+    after = METRICS.method(f"{__name__}.failing_class.fail").snapshot()
+    assert after.errors - before.errors == 3
+    assert after.exceptions["KeyError"] - before.exceptions.get("KeyError", 0) == 3
+    assert failure_report()[f"{__name__}.failing_class.fail"]["error_rate"] == 1.0
+
+    process_lines = list(obj.logger.read_log_lines("START"))
+    assert sum(" | START | " in line for line in process_lines) == 3
+    assert sum(" | END | " in line for line in process_lines) == 3
+    error_lines = "".join(obj.logger.read_log_lines("ERROR"))
+    assert error_lines.count("Failed 'fail' after") == 3
+    assert error_lines.count("Traceback of 'fail'") == 1
+
+
+def test_circuit_breaker_short_circuits_fast_failures(tmp_path):
+    breaker = CircuitBreaker(failure_threshold=2, fast_failure_seconds=1.0, reset_timeout=0.05)
+    obj = failing_class(str(tmp_path), breaker)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            obj.maybe_fail(True)
+    assert breaker.is_open(f"{__name__}.failing_class.maybe_fail")
+
+    with pytest.raises(CircuitOpenError):
+        obj.maybe_fail(False)
+    assert METRICS.method(f"{__name__}.failing_class.maybe_fail").snapshot().short_circuits >= 1
+
+    time.sleep(0.06)
+    assert obj.maybe_fail(False) == "ok"
+    assert not breaker.is_open(f"{__name__}.failing_class.maybe_fail")
+
+
+def test_logging_errors_do_not_leak_the_call(tmp_path, monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, fast_failure_seconds=1.0, reset_timeout=0.05)
+    obj = failing_class(str(tmp_path), breaker)
+    with pytest.raises(ValueError):
+        obj.maybe_fail(True)
+    time.sleep(0.06)
+
+    def broken_log(*args, **kwargs):
+        raise OSError("disk full")
+
+    # The half-open trial fails in START, before the method runs.
+    monkeypatch.setattr(obj.logger, "start", broken_log)
+    with pytest.raises(OSError):
+        obj.maybe_fail(False)
+    assert METRICS.method(f"{__name__}.failing_class.maybe_fail").snapshot().in_flight == 0
+    assert CURRENT_CALL.get() is None
+    monkeypatch.undo()
+
+    monkeypatch.setattr(obj.logger, "end", broken_log)
+    time.sleep(0.06)
+    with pytest.raises(OSError):
+        obj.maybe_fail(False)
+    assert CURRENT_CALL.get() is None
+    assert not breaker.is_open(f"{__name__}.failing_class.maybe_fail")
+    monkeypatch.undo()
+    assert obj.maybe_fail(False) == "ok"
+
+
+class nologger_class(BaseClass):
+    """Testing the monitoring of objects without a logger."""
+
+    def __init__(self):
+        pass
+
+    def fail(self, fail):
+        if fail:
+            raise KeyError("asked to fail")
+        return CURRENT_CALL.get()
+
+    async def fail_async(self, fail):
+        return self.fail(fail)
+
+    async def fail_async_slowly(self):
+        await asyncio.sleep(10)
+
+
+def test_calls_without_a_logger_are_recorded():
+    obj = nologger_class()
+    before = METRICS.method(f"{__name__}.nologger_class.fail").snapshot()
+    assert obj.fail(False) is None
+    with pytest.raises(KeyError):
+        obj.fail(True)
+    assert asyncio.run(obj.fail_async(False)) is None
+    with pytest.raises(KeyError):
+        asyncio.run(obj.fail_async(True))
+
+    after = METRICS.method(f"{__name__}.nologger_class.fail").snapshot()
+    assert after.calls - before.calls == 4
+    assert after.exceptions["KeyError"] - before.exceptions.get("KeyError", 0) == 2
+    assert after.in_flight == 0
+    assert METRICS.method(f"{__name__}.nologger_class.fail_async").snapshot().errors >= 1
+
+
+class rotated_class(BaseClass):
+    """Testing the global logger options."""
+
+    def work(self):
+        return 1
+
+
+def test_global_log_options_reach_the_logger(tmp_path, monkeypatch):
+    monkeypatch.setattr(BaseClass, "log_options", {}, raising=False)
+    BaseClass.set_global_log_options(max_bytes=300, retention_days=7)
+    obj = rotated_class(str(tmp_path), "rotated")
+    assert obj.logger.max_bytes == 300
+    assert obj.logger.retention_days == 7
+    assert obj.logger.compression is None
+    for _ in range(10):
+        obj.work()
+    assert len(obj.logger.iter_log_files("START")) > 1
+
+    with pytest.raises(ValueError):
+        BaseClass.set_global_log_options(compression="zip")
+
+
+def test_same_named_classes_of_different_modules_are_kept_apart():
+    source = "class Worker(BaseClass):\n    def __init__(self):\n        pass\n\n    def run(self):\n        return 1\n"
+    for module in ("collide_a", "collide_b"):
+        namespace = {"__name__": module, "BaseClass": BaseClass}
+        exec(source, namespace)
+        assert namespace["Worker"]().run() == 1
+    assert METRICS.method("collide_a.Worker.run").snapshot().calls == 1
+    assert METRICS.method("collide_b.Worker.run").snapshot().calls == 1
+
+
+def test_interrupts_and_cancellations_are_not_failures(tmp_path):
+    breaker = CircuitBreaker(failure_threshold=1, fast_failure_seconds=1.0, reset_timeout=0.05)
+    obj = failing_class(str(tmp_path), breaker)
+    name = f"{__name__}.failing_class.interrupt"
+    before = METRICS.method(name).snapshot()
+    for _ in range(2):
+        with pytest.raises(KeyboardInterrupt):
+            obj.interrupt()
+    after = METRICS.method(name).snapshot()
+    assert after.errors == before.errors
+    assert after.cancellations - before.cancellations == 2
+    assert after.in_flight == 0
+    assert not breaker.is_open(name)
+    assert "Cancelled 'interrupt'" in "".join(obj.logger.read_log_lines("WARNING"))
+    assert "Failed 'interrupt'" not in "".join(obj.logger.read_log_lines("ERROR"))
+
+    async def cancel():
+        task = asyncio.create_task(nologger_class().fail_async_slowly())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    name = f"{__name__}.nologger_class.fail_async_slowly"
+    before = METRICS.method(name).snapshot()
+    asyncio.run(cancel())
+    after = METRICS.method(name).snapshot()
+    assert (after.calls, after.cancellations - before.cancellations) == (before.calls, 1)
@@ -0,0 +1,63 @@
+"""Testing the benchmark suite."""
+
+from benchmarks.run_benchmarks import _summary, compare_results, make_payload
+
+
+def _document(**values):
+    return {
+        "results": {
+            name: {"value": value, "unit": "x", "higher_is_better": name.endswith("per_second")}
+            for name, value in values.items()
+        }
+    }
+
+
+def test_compare_results_flags_regressions():
+    baseline = _document(records_per_second=1000.0, save_ms=10.0, load_ms=10.0)
+    current = _document(records_per_second=800.0, save_ms=10.5, load_ms=13.0)
+    rows = {row["name"]: row for row in compare_results(baseline, current, threshold=0.1)}
+    assert rows["records_per_second"]["regression"]
+    assert not rows["save_ms"]["regression"]
+    assert rows["load_ms"]["regression"]
+
+
+def test_compare_results_ignores_improvements_and_missing():
+    baseline = _document(records_per_second=1000.0, save_ms=10.0, removed_ms=1.0)
+    current = _document(records_per_second=2000.0, save_ms=5.0)
+    rows = compare_results(baseline, current, threshold=0.1)
+    assert [row["name"] for row in rows] == ["records_per_second", "save_ms"]
+    assert not any(row["regression"] for row in rows)
+
+
+def test_compare_results_from_zero_and_derived():
+    baseline = _document(errors_ms=0.0, idle_ms=0.0)
+    baseline["results"]["overhead_ns"] = {"value": 100.0, "unit": "ns", "higher_is_better": False, "derived": True}
+    current = _document(errors_ms=1.0, idle_ms=0.0)
+    current["results"]["overhead_ns"] = {"value": 400.0, "unit": "ns", "higher_is_better": False, "derived": True}
+    rows = {row["name"]: row for row in compare_results(baseline, current, threshold=0.1)}
+    assert rows["errors_ms"]["regression"]
+    assert not rows["idle_ms"]["regression"]
+    assert rows["overhead_ns"]["change"] == 3.0
+    assert not rows["overhead_ns"]["regression"]
+
+
+def test_compare_results_ignores_changes_within_the_noise():
+    baseline = _document(save_ms=10.0, load_ms=10.0)
+    baseline["results"]["save_ms"]["spread"] = 2.0
+    current = _document(save_ms=12.0, load_ms=12.0)
+    current["results"]["save_ms"]["spread"] = 1.0
+    rows = {row["name"]: row for row in compare_results(baseline, current, threshold=0.1)}
+    assert rows["save_ms"]["noise"] == 0.3
+    assert not rows["save_ms"]["regression"]
+    assert rows["load_ms"]["regression"]
+
+
+def test_summary_reports_the_median_and_spread():
+    result = _summary([1.0, 2.0, 3.0, 4.0, 100.0], "ms", False)
+    assert result["value"] == 3.0
+    assert 0 < result["spread"] < 100.0
+
+
+def test_make_payload_is_reproducible():
+    assert make_payload(10, "dict") == make_payload(10, "dict")
+    assert len(make_payload(10, "list")) == 10
@@ -0,0 +1,92 @@
+"""Testing the live dashboard."""
+
+import io
+import time
+
+from rich.console import Console
+
+from abm_common_functions.base_class import BaseClass
+from abm_common_functions.cli_text_format import Dashboard
+from abm_common_functions.dict_io import DictIO
+from abm_common_functions.emo_logger import EmoLogger
+from abm_common_functions.metrics import MetricsRegistry, histogram_percentile
+
+
+def _text(renderable):
+    console = Console(file=io.StringIO(), width=200)
+    console.print(renderable)
+    return console.file.getvalue()
+
+
+def test_histogram_percentile():
+    assert histogram_percentile((0,) * 15, 0.5) is None
+    counts = (0, 10) + (0,) * 13
+    assert 0.0005 < histogram_percentile(counts, 0.5) <= 0.001
+    assert histogram_percentile((0,) * 14 + (3,), 0.99) == 10.0
+
+
+def test_dashboard_render(tmp_path, monkeypatch):
+    monkeypatch.setattr(BaseClass, "log_folder", str(tmp_path / "logs"), raising=False)
+    monkeypatch.setattr(BaseClass, "app_name", "dashboard", raising=False)
+    registry = MetricsRegistry()
+    registry.method("Worker.run").record(0.002)
+    logger = EmoLogger(str(tmp_path), "dashboard_app", write_to_file=False)
+    logger.info("counted")
+    store = DictIO(str(tmp_path / "stores" / "store.pickle"))
+    store["a"] = 1
+
+    dashboard = Dashboard(registry=registry, stores=[store], refresh_per_second=1000)
+    text = _text(dashboard.render())
+    assert "Worker.run" in text
+    assert "dashboard_app" in text
+    assert "dirty" in text
+    assert text.count(" ms") == 3
+
+    store.save()
+    registry.method("Worker.run").record(0.002)
+    time.sleep(0.01)
+    text = _text(dashboard.render())
+    assert "saved" in text
+    # The last save and its p50 and p95 are now filled in.
+    assert text.count(" ms") == 3 + 3
+    assert "/s" in text
+
+
+def test_dashboard_render_is_throttled():
+    dashboard = Dashboard(registry=MetricsRegistry(), stores=[], refresh_per_second=0.5)
+    assert dashboard.render() is dashboard.render()
+
+
+def test_dashboard_live(tmp_path):
+    console = Console(file=io.StringIO(), width=200, force_terminal=True)
+    with Dashboard(registry=MetricsRegistry(), stores=[], console=console):
+        pass
+    assert "Methods" in console.file.getvalue()
+
+
+def test_dashboard_shows_log_records_in_its_panel(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(BaseClass, "log_folder", str(tmp_path / "logs"), raising=False)
+    monkeypatch.setattr(BaseClass, "app_name", "dashboard_live", raising=False)
+
+    class Worker(BaseClass):
+        def run(self) -> int:
+            return 1
+
+    worker = Worker()
+    worker.logger = EmoLogger(str(tmp_path), "dashboard_live_logger", write_to_file=False)
+    # The log capture handler of pytest on the root logger keeps EmoLogger from adding its own.
+    worker.logger.logger.addHandler(worker.logger.stream_handler)
+    console = Console(file=io.StringIO(), width=200, force_terminal=True)
+    dashboard = Dashboard(registry=MetricsRegistry(), stores=[], console=console, log_lines=2)
+    with dashboard:
+        assert worker.run() == 1
+    assert worker.run() == 1
+
+    assert len(dashboard.log_tail.lines) == 2
+    assert dashboard.log_tail.lines[0].endswith("- Ending 'run'")
+    assert "- Execution time for 'run': " in dashboard.log_tail.lines[1]
+    assert "Ending 'run'" in _text(dashboard._log_panel())
+    assert "Starting 'run'" not in console.file.getvalue()
+    # Only the call made after the dashboard stopped reaches stdout.
+    assert capsys.readouterr().out.count("Starting 'run'") == 1
+    worker.logger.close()
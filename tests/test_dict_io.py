@@ -0,0 +1,204 @@
+"""Testing the DictIO snapshots, diffs and replication."""
+
+import sys
+import threading
+
+import pytest
+
+from abm_common_functions.base_class import BaseClass
+from abm_common_functions.dict_io import META_KEYS, DictIO, diff_snapshots, live_stores
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(BaseClass, "log_folder", str(tmp_path / "logs"), raising=False)
+    monkeypatch.setattr(BaseClass, "app_name", "dict_io", raising=False)
+    store = DictIO(str(tmp_path / "stores" / "store.pickle"))
+    store["a"] = 1
+    store["b"] = [1, 2]
+    return store
+
+
+def test_snapshot_is_copy_on_write(store):
+    snapshot = store.snapshot()
+    assert snapshot.version == store.snapshot().version
+    assert snapshot._data is store.data
+
+    store["a"] = 2
+    store["c"] = 3
+    assert snapshot["a"] == 1
+    assert "c" not in snapshot
+    assert store["a"] == 2
+    assert snapshot["b"] is store["b"]
+
+
+def test_diff_reports_changed_keys(store):
+    first = store.snapshot()
+    store["a"] = 2
+    store["c"] = 3
+    del store["b"]
+    store["tmp"] = 1
+    del store["tmp"]
+    second = store.snapshot()
+
+    assert diff_snapshots(first, second) == {"a", "b", "c"}
+    assert diff_snapshots(second, first) == {"a", "b", "c"}
+    assert store.diff(second) == set()
+    store["b"] = "back"
+    assert store.diff(second) == {"b"}
+
+
+def test_diff_of_different_stores_fails(store, tmp_path):
+    other = DictIO(str(tmp_path / "stores" / "other.pickle"))
+    with pytest.raises(ValueError):
+        diff_snapshots(store.snapshot(), other.snapshot())
+
+
+def test_snapshot_save_in_background(store, tmp_path):
+    snapshot = store.snapshot()
+    filepath = str(tmp_path / "stores" / "snapshot.pickle")
+    thread = threading.Thread(target=snapshot.save, args=(filepath,))
+    thread.start()
+    store["a"] = "changed while saving"
+    thread.join()
+
+    copy = DictIO(filepath)
+    assert copy["a"] == 1
+
+
+def test_older_snapshot_never_replaces_a_newer_save(store):
+    store.save()
+    snapshot = store.snapshot()
+    store["a"] = 2
+    store.save()
+    assert not snapshot.save()
+    store.save()
+
+    assert DictIO(store.filepath)["a"] == 2
+    assert store.is_saved
+
+
+def test_snapshots_are_consistent_with_concurrent_writes(store):
+    stop = threading.Event()
+
+    def write():
+        i = 0
+        while not stop.is_set():
+            store[f"key_{i % 50}"] = i
+            i += 1
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(2000):
+            snapshot = store.snapshot()
+            assert max(snapshot._key_versions.values()) <= snapshot.version
+            assert snapshot._key_versions.keys() == snapshot.keys() - META_KEYS
+    finally:
+        stop.set()
+        writer.join()
+
+
+def test_replicate_incrementally(store, tmp_path):
+    replica = DictIO(str(tmp_path / "stores" / "replica.pickle"))
+    since = store.replicate(replica)
+    assert replica["a"] == 1 and replica["b"] == [1, 2]
+
+    store["a"] = 2
+    del store["b"]
+    since = store.replicate(replica, since)
+    assert replica["a"] == 2
+    assert "b" not in replica.data
+
+    reloaded = DictIO(replica.filepath)
+    assert reloaded["a"] == 2
+    assert store.diff(since) == set()
+
+
+def test_load_marks_keys_changed(store):
+    store.save()
+    snapshot = store.snapshot()
+    store["d"] = 4
+    store.load(overwrite=True)
+    assert store.diff(snapshot) == {"a", "b"}
+    assert "d" not in store.data
+
+
+def test_reads_do_not_copy_a_shared_dict(store):
+    snapshot = store.snapshot()
+    assert store["a"] == 1
+    assert store.data is snapshot._data
+    read_time = store._get_last_read_timestamp()
+    store["a"] = 2
+    assert store.data["_last_read_timestamp"] == read_time
+
+
+def test_tombstones_are_pruned(store):
+    snapshot = store.snapshot()
+    del store["a"]
+    assert store.diff(snapshot) == {"a"}
+    del snapshot
+    store.snapshot()
+    assert store._deleted == {}
+    del store["b"]
+    assert store._deleted == {}
+
+
+def test_background_save_of_the_current_version_saves_the_store(store):
+    snapshot = store.snapshot()
+    thread = threading.Thread(target=snapshot.save)
+    thread.start()
+    thread.join()
+    assert store.is_saved
+    store["a"] = 2
+    assert not store.is_saved
+
+
+def test_writes_after_a_dropped_snapshot_do_not_copy(store):
+    store.save()
+    data = store.data
+    store["a"] = 2
+    assert store.data is data
+
+    store.diff(store.snapshot())
+    store["a"] = 3
+    assert store.data is data
+
+    snapshot = store.snapshot()
+    store["a"] = 4
+    assert store.data is not snapshot._data
+    del snapshot
+    data = store.data
+    store["a"] = 5
+    assert store.data is data
+
+
+def test_store_ids_are_never_reused(store, tmp_path):
+    ids = {store._store_id}
+    for _ in range(3):
+        other = DictIO(str(tmp_path / "stores" / "other.pickle"))
+        ids.add(other.snapshot()._store_id)
+        del other
+    assert len(ids) == 4
+
+
+def test_live_stores_while_stores_are_created(store, tmp_path):
+    stop = threading.Event()
+    created = []
+
+    def create():
+        while not stop.is_set():
+            created.append(DictIO(str(tmp_path / "stores" / "created.pickle"), load=False))
+
+    # Switch threads often, so stores are added while live_stores copies the set.
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    creator = threading.Thread(target=create)
+    creator.start()
+    try:
+        for _ in range(2000):
+            assert store in live_stores()
+    finally:
+        stop.set()
+        creator.join()
+        sys.setswitchinterval(switch_interval)
@@ -1,6 +1,13 @@
 """Testing the EmoLogger class."""
 
-from abm_common_functions.emo_logger import EmoLogger
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from abm_common_functions.emo_logger import RECORD_COUNTS, EmoFilter, EmoLogger, compress_log_file, wait_for_maintenance
 
 
 def test_emo_logger_init():
@@ -80,3 +87,112 @@ def test_emo_logger_end():
     assert logger is not None
     assert logger.last_message is not None
     assert logger.last_message_time is not None
+
+
+def test_emo_logger_rotation(tmp_path):
+    logger = EmoLogger(str(tmp_path), "rotation", max_bytes=300)
+    for i in range(20):
+        logger.info(f"rotating message {i}")
+    files = logger.iter_log_files("INFO")
+    assert len(files) > 1
+    assert files[-1].endswith("INFO.log")
+    lines = list(logger.read_log_lines("INFO"))
+    assert len(lines) == 20
+    assert "rotating message 0 " in lines[0]
+    assert "rotating message 19 " in lines[-1]
+
+
+def test_emo_logger_lines_carry_the_thread_id(tmp_path):
+    logger = EmoLogger(str(tmp_path), "thread_id")
+    logger.info("message")
+    thread = threading.current_thread()
+    [line] = logger.read_log_lines("INFO")
+    assert line.rstrip("\n").endswith(f" | {thread.name}({thread.ident}):- | -")
+    record = logging.LogRecord("thread_id", logging.INFO, __file__, 1, "message", None, None)
+    EmoFilter().filter(record)
+    assert f" | {thread.name}({thread.ident}):- #- | " in logger.formatter.format(record)
+
+
+def test_emo_logger_compression(tmp_path):
+    logger = EmoLogger(str(tmp_path), "compression", max_bytes=200, compression="gzip")
+    for i in range(20):
+        logger.done(f"compressed message {i}")
+    wait_for_maintenance()
+    files = logger.iter_log_files("DONE")
+    assert any(filename.endswith(".gz") for filename in files)
+    lines = list(logger.read_log_lines("DONE"))
+    assert [line.split(" | ")[2] for line in lines] == [f"compressed message {i}" for i in range(20)]
+
+
+def test_emo_logger_compression_keeps_existing_archive(tmp_path):
+    day_folder = tmp_path / "late_append" / "2000-01-01"
+    day_folder.mkdir(parents=True)
+    (day_folder / "INFO.log").write_text("first run\n")
+    compress_log_file(str(day_folder / "INFO.log"), "gzip")
+    (day_folder / "INFO.log").write_text("late append\n")
+    logger = EmoLogger(str(tmp_path), "late_append", write_to_file=False)
+    assert [line.strip() for line in logger.read_log_lines("INFO", "2000-01-01")] == ["first run", "late append"]
+
+    compress_log_file(str(day_folder / "INFO.log"), "gzip")
+    assert [path.name for path in day_folder.iterdir()] == ["INFO.log.gz"]
+    assert [line.strip() for line in logger.read_log_lines("INFO", "2000-01-01")] == ["first run", "late append"]
+
+
+def test_emo_logger_retention(tmp_path):
+    app_folder = tmp_path / "retention"
+    for day in ("2000-01-01", "2000-01-02"):
+        (app_folder / day).mkdir(parents=True)
+        (app_folder / day / "INFO.log").write_text("old line\n")
+    logger = EmoLogger(str(tmp_path), "retention", retention_days=30, compression="lzma")
+    logger.info("new day")
+    wait_for_maintenance()
+    assert sorted(path.name for path in app_folder.iterdir()) == [logger.current_date]
+
+
+def test_emo_logger_retention_bytes(tmp_path):
+    app_folder = tmp_path / "retention_bytes"
+    for day in ("2000-01-01", "2000-01-02"):
+        (app_folder / day).mkdir(parents=True)
+        (app_folder / day / "INFO.log").write_text("x" * 100)
+    logger = EmoLogger(str(tmp_path), "retention_bytes", retention_bytes=250)
+    logger.info("new day")
+    wait_for_maintenance()
+    assert sorted(path.name for path in app_folder.iterdir()) == ["2000-01-02", logger.current_date]
+
+
+def test_emo_logger_state_does_not_grow_the_context(tmp_path):
+    before = len(contextvars.copy_context())
+    for i in range(50):
+        logger = EmoLogger(str(tmp_path), f"context_{i}", write_to_file=False)
+        logger.info("message")
+        assert logger.last_message == "message"
+        logger.close()
+    assert len(contextvars.copy_context()) <= before + 1
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_emo_logger_threaded_rotation_keeps_every_line(tmp_path, compression):
+    logger = EmoLogger(str(tmp_path), f"threaded_rotation_{compression}", max_bytes=2000, compression=compression)
+
+    def write(thread_index):
+        for i in range(500):
+            logger.warning(f"thread {thread_index} message {i}")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(write, range(8)))
+    wait_for_maintenance()
+    assert len(list(logger.read_log_lines("WARNING"))) == 4000
+    assert RECORD_COUNTS[(logger.app_name, logging.WARNING)] == 4000
+
+
+def test_emo_logger_reports_maintenance_failures(tmp_path, monkeypatch, caplog):
+    logger = EmoLogger(str(tmp_path), "maintenance_failure", max_bytes=10, compression="gzip")
+
+    def broken_compress(filename, compression):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("abm_common_functions.emo_logger.compress_log_file", broken_compress)
+    with caplog.at_level(logging.ERROR):
+        logger.info("rotated right away")
+        wait_for_maintenance()
+    assert [record.getMessage() for record in caplog.records] == ["Log maintenance failed: OSError: disk full"]
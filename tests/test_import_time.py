@@ -0,0 +1,71 @@
+"""Import time regression tests, based on `python -X importtime`."""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+import abm_common_functions
+
+HEAVY_MODULES = {"rich", "pickle", "gzip", "lzma", "bz2", "shutil", "inspect", "dataclasses", "concurrent.futures"}
+
+
+def imported_modules(statement):
+    """Run `statement` in a fresh interpreter with `-X importtime`.
+
+    Returns the modules loaded afterwards, mapped to the cumulative import time in us
+    reported by `-X importtime`, or None for modules it does not report, such as the
+    ones loaded through importlib.import_module.
+    """
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"{statement}; import json, sys; print(json.dumps(sorted(sys.modules)))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            timings[name.strip()] = int(cumulative)
+    loaded = json.loads(completed.stdout.splitlines()[-1])
+    return {name: timings.get(name) for name in loaded}
+
+
+def test_package_import_is_lazy():
+    modules = imported_modules("import abm_common_functions")
+    assert modules["abm_common_functions"] is not None
+    assert not [name for name in modules if name.startswith("abm_common_functions.")]
+    assert "logging" not in modules
+    assert "typing" not in modules
+
+
+def test_dict_io_import_defers_heavy_modules():
+    modules = imported_modules("from abm_common_functions import DictIO")
+    assert "abm_common_functions.dict_io" in modules
+    assert HEAVY_MODULES.isdisjoint(modules)
+
+
+def test_dashboard_import_defers_rich():
+    modules = imported_modules("from abm_common_functions import Dashboard")
+    assert "abm_common_functions.cli_text_format" in modules
+    assert not [name for name in modules if name == "rich" or name.startswith("rich.")]
+
+
+def test_lazy_attributes():
+    assert sorted(abm_common_functions.__all__) == sorted(abm_common_functions._LAZY_ATTRIBUTES)
+    assert set(abm_common_functions.__all__) <= set(dir(abm_common_functions))
+    from abm_common_functions.dict_io import DictIO
+
+    assert abm_common_functions.DictIO is DictIO
+    with pytest.raises(AttributeError):
+        _ = abm_common_functions.missing_name
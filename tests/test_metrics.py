@@ -0,0 +1,130 @@
+"""Testing the method metrics and their exporters."""
+
+import threading
+import urllib.request
+
+from abm_common_functions.base_class import BaseClass
+from abm_common_functions.metrics import (
+    MAX_THREAD_SERIES,
+    METRICS,
+    OTHER_THREADS,
+    MetricsFileDumper,
+    MetricsRegistry,
+    MetricsServer,
+    render_openmetrics,
+)
+
+
+class metrics_class(BaseClass):
+    """Testing class for the metrics."""
+
+    def __init__(self):
+        pass
+
+    def ok(self):
+        return 1
+
+    def fail(self):
+        raise ValueError("failing on purpose")
+
+
+def test_method_stats_record():
+    registry = MetricsRegistry()
+    stats = registry.method("Some.method")
+    stats.record(0.0001)
+    stats.record(0.3)
+    stats.record(100.0, error=True)
+    snapshot = stats.snapshot()
+    assert snapshot.calls == 3
+    assert snapshot.errors == 1
+    assert snapshot.bucket_counts[0] == 1
+    assert snapshot.bucket_counts[-1] == 0
+    assert snapshot.failure_bucket_counts[-1] == 1
+    assert snapshot.exceptions == {"unknown": 1}
+    assert registry.method("Some.method") is stats
+
+
+def test_method_stats_in_flight():
+    stats = MetricsRegistry().method("Some.method")
+    first = stats.enter()
+    second = stats.enter()
+    assert stats.in_flight == 2
+    stats.leave(second, 0.1)
+    stats.leave(first, 0.1)
+    snapshot = stats.snapshot()
+    assert (snapshot.calls, snapshot.in_flight, snapshot.max_in_flight, snapshot.contended_calls) == (2, 0, 2, 1)
+
+
+def test_method_stats_fold_finished_threads():
+    stats = MetricsRegistry().method("Some.method")
+
+    def call():
+        stats.leave(stats.enter(), 0.1)
+
+    for _ in range(2 * MAX_THREAD_SERIES):
+        thread = threading.Thread(target=call)
+        thread.start()
+        thread.join()
+    call()
+    assert len(stats.thread_seconds) <= MAX_THREAD_SERIES + 1
+    busy = stats.snapshot().thread_seconds
+    assert set(busy) == {(None, OTHER_THREADS), (threading.get_ident(), threading.current_thread().name)}
+    assert round(sum(busy.values()), 6) == round(0.1 * (2 * MAX_THREAD_SERIES + 1), 6)
+
+
+def test_registry_reset_keeps_method_stats():
+    registry = MetricsRegistry()
+    stats = registry.method("Some.method")
+    stats.record(0.1, error=True, exception_type="ValueError")
+    running = stats.enter()
+    registry.reset()
+    assert registry.method("Some.method") is stats
+    snapshot = stats.snapshot()
+    assert (snapshot.calls, snapshot.exceptions, snapshot.in_flight) == (0, {}, 1)
+    stats.leave(running, 0.1)
+    assert [snapshot.calls for snapshot in registry.snapshot()] == [1]
+
+
+def test_monitor_records_calls_and_errors():
+    obj = metrics_class()
+    before = METRICS.method(f"{__name__}.metrics_class.fail").snapshot()
+    obj.ok()
+    try:
+        obj.fail()
+    except ValueError:
+        pass
+    assert METRICS.method(f"{__name__}.metrics_class.ok").snapshot().calls >= 1
+    after = METRICS.method(f"{__name__}.metrics_class.fail").snapshot()
+    assert after.calls == before.calls + 1
+    assert after.errors == before.errors + 1
+
+
+def test_render_openmetrics():
+    registry = MetricsRegistry()
+    registry.method('Odd"name').record(0.002)
+    text = render_openmetrics(registry)
+    assert 'abm_method_calls_total{method="Odd\\"name"} 1' in text
+    assert 'abm_method_duration_seconds_bucket{method="Odd\\"name",le="0.001"} 0' in text
+    assert 'abm_method_duration_seconds_bucket{method="Odd\\"name",le="+Inf"} 1' in text
+    assert text.endswith("# EOF\n")
+
+
+def test_metrics_server():
+    registry = MetricsRegistry()
+    registry.method("Served.method").record(0.01)
+    server = MetricsServer(port=0, registry=registry).start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            body = response.read().decode("UTF-8")
+    finally:
+        server.stop()
+    assert 'abm_method_calls_total{method="Served.method"} 1' in body
+
+
+def test_metrics_file_dumper(tmp_path):
+    registry = MetricsRegistry()
+    registry.method("Dumped.method").record(0.01)
+    filepath = tmp_path / "metrics" / "metrics.prom"
+    dumper = MetricsFileDumper(str(filepath), interval=0.01, registry=registry).start()
+    dumper.stop()
+    assert 'abm_method_calls_total{method="Dumped.method"} 1' in filepath.read_text()